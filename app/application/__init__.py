@@ -1,40 +1,158 @@
+import time
 from app.application.dic import DIC
-from app.infra.repositories import MemoryUserRepository, MeoryPostRepository, MySQLPostRepository
-from app.infra.persistence.mem_db.fake_database import fake_database
+from app.infra.repositories import (
+    MemoryUserRepository,
+    MySQLUserRepository,
+    MeoryPostRepository,
+    MySQLPostRepository,
+    ShardedMySQLPostRepository,
+    PublishingPostRepository,
+)
+from app.infra.events import BroadcastHub
+from app.infra.persistence.mem_db.fake_database import fake_database, FakeDatabase
+from app.infra.persistence.mem_db.storage import StorageEngine
 from app.infra.persistence.mysql.database import Database
+from app.infra.persistence.mysql.snowflake import SnowflakeIdGenerator
 from app.application.post_service import PostService
+from app.application.post_counters import PostCounters
+from app.domain.repositories import PostRepository, UserRepository
 from app.config.config import config
+from app.infra.tracing import tracer, StdoutSpanExporter, FileSpanExporter
 
 
 async def application_startup():
+    # tracing, spans are exported as OTLP/JSON lines
+    tracing_conf = config["tracing"]
+    if tracing_conf["enabled"]:
+        match tracing_conf["exporter"]:
+            case "file":
+                exporter = FileSpanExporter(file_path=tracing_conf["file_path"])
+            case _:
+                exporter = StdoutSpanExporter()
+        tracer.configure(
+            exporter=exporter,
+            sample_ratio=tracing_conf["sample_ratio"],
+            service_name=tracing_conf["service_name"],
+        )
+
     # load conf and init db
-    my_sql_conf = config["databases"]["mysql"]
-    mysql_db = Database(
-        host=my_sql_conf["host"],
-        port=my_sql_conf["port"],
-        user=my_sql_conf["user"],
-        password=my_sql_conf["password"],
-        dbname=my_sql_conf["dbname"],
+    match config["databases"]["backend"]:
+        case "memory":
+            user_repository, post_repository = init_memory_repositories()
+        case _:
+            user_repository, post_repository = await init_mysql_repositories()
+
+    # writes are published to the change feed
+    change_feed_conf = config["change_feed"]
+    DIC.change_hub = BroadcastHub(
+        history_size=change_feed_conf["history_size"],
+        queue_size=change_feed_conf["queue_size"],
     )
-    await mysql_db.init_connection()
+    post_repository = PublishingPostRepository(post_repository=post_repository, hub=DIC.change_hub)
 
-    # mem db
-    user_repository = MemoryUserRepository(database=fake_database)
-    # post_repository = MeoryPostRepository(database=fake_database)
-    post_repository = MySQLPostRepository(database=mysql_db)
+    # counters follow the change feed, seeded by a full count and reconciled periodically
+    DIC.post_counters = PostCounters(post_repository=post_repository, hub=DIC.change_hub)
+    await DIC.post_counters.reconcile()
+    DIC.post_counters.start(interval=config["aggregates"]["reconcile_interval"])
 
     DIC.post_service = PostService(
         post_repository=post_repository,
         user_repository=user_repository,
+        post_counters=DIC.post_counters,
+        max_concurrent_exports=config["export"]["max_concurrent"],
     )
 
+
+def init_memory_repositories() -> tuple[UserRepository, PostRepository]:
+    mem_db_conf = config["databases"]["mem_db"]
+    # durable when a storage path is set, volatile demo data otherwise
+    mem_db = FakeDatabase(
+        storage=StorageEngine(
+            path=mem_db_conf["path"],
+            commit_interval=mem_db_conf["commit_interval"],
+            compact_threshold=mem_db_conf["compact_threshold"],
+        )
+    ) if mem_db_conf["path"] else fake_database
+    if mem_db.storage:
+        mem_db.storage.start()
+
+    DIC.mem_db = mem_db
+    return MemoryUserRepository(database=mem_db), MeoryPostRepository(database=mem_db)
+
+
+async def init_mysql_repositories() -> tuple[UserRepository, PostRepository]:
+    mysql_db = build_mysql_database(config["databases"]["mysql"])
+    await mysql_db.init_connection()
     DIC.mysql_db = mysql_db
 
+    user_repository = MySQLUserRepository(database=mysql_db)
+    post_repository: PostRepository = MySQLPostRepository(database=mysql_db)
 
-async def application_shutdown():
-    if DIC.mysql_db:
-        await DIC.mysql_db.close()
+    # posts spread over several databases
+    sharding_conf = config["databases"]["sharding"]
+    if sharding_conf["enabled"]:
+        DIC.mysql_shards = [build_mysql_database(shard_conf) for shard_conf in sharding_conf["shards"]]
+        for shard_db in DIC.mysql_shards:
+            await shard_db.init_connection()
+        post_repository = ShardedMySQLPostRepository(
+            databases=DIC.mysql_shards,
+            id_generator=SnowflakeIdGenerator(worker_id=sharding_conf["worker_id"]),
+            user_repository=user_repository,
+            legacy_max_id=sharding_conf["legacy_max_id"],
+        )
+
+    return user_repository, post_repository
+
+
+# run on the stop signal, change streams never end on their own and would hold the server's graceful wait
+def application_close_streams():
+    if DIC.change_hub:
+        DIC.change_hub.close()
+
+
+# timeout bounds the wait for pooled connections in use, returns the number of terminated ones
+async def application_shutdown(timeout: float | None = None) -> int:
+    if DIC.post_counters:
+        await DIC.post_counters.stop()
+
+    application_close_streams()
+
+    # one deadline shared by all pools
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    terminated = 0
+    for db in ([DIC.mysql_db] if DIC.mysql_db else []) + DIC.mysql_shards:
+        terminated += await db.close(
+            timeout=max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        )
+    DIC.mysql_db = None
+    DIC.mysql_shards = []
+
+    if DIC.mem_db and DIC.mem_db.storage:
+        # flush what is left of the log
+        await DIC.mem_db.storage.close()
+
+    if tracer.exporter:
+        # write the spans still queued
+        tracer.exporter.close()
+    tracer.configure(enabled=False)
+
+    return terminated
 
 
 async def application_health_check():
-    await DIC.mysql_db.check_connection()
+    if DIC.mysql_db:
+        await DIC.mysql_db.check_connection()
+    for shard_db in DIC.mysql_shards:
+        await shard_db.check_connection()
+
+
+def build_mysql_database(my_sql_conf: dict) -> Database:
+    return Database(
+        host=my_sql_conf["host"],
+        port=my_sql_conf["port"],
+        user=my_sql_conf["user"],
+        password=my_sql_conf["password"],
+        dbname=my_sql_conf["dbname"],
+        # one unbuffered connection per running export
+        max_unbuffered=config["export"]["max_concurrent"],
+    )
@@ -1,6 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from app.application.post_service import PostService
+from app.application.post_counters import PostCounters
 from app.infra.persistence.mysql.database import Database
+from app.infra.persistence.mem_db.fake_database import FakeDatabase
+from app.infra.events import BroadcastHub
 
 # expose
 __all__ = ("DIC", )
@@ -10,6 +13,10 @@ __all__ = ("DIC", )
 class DependencyInjectionContainer:
     post_service: PostService | None = None
     mysql_db: Database | None = None
+    mysql_shards: list[Database] = field(default_factory=list)
+    mem_db: FakeDatabase | None = None
+    change_hub: BroadcastHub | None = None
+    post_counters: PostCounters | None = None
 
 
 DIC = DependencyInjectionContainer()
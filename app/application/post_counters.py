@@ -0,0 +1,97 @@
+import asyncio
+from collections import Counter
+from app.domain.repositories import PostRepository
+from app.infra.events import BroadcastHub, ChangeEvent
+
+# expose
+__all__ = ("PostCounters", )
+
+RECONCILE_ATTEMPTS = 3
+
+
+# post counts per author and in total, kept in memory
+# - maintained incrementally from the change events: created, deleted and ownership changes
+# - periodically reconciled against the repository to correct any drift
+#   (writes from other processes, events lost on a crash)
+class PostCounters:
+    def __init__(self, post_repository: PostRepository, hub: BroadcastHub) -> None:
+        self.post_repository = post_repository
+        self.hub = hub
+        self._per_user: Counter[int] = Counter()
+        self._total = 0
+        self._reconcile_task: asyncio.Task | None = None
+        hub.add_listener(self.apply)
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    def count_for(self, user_id: int) -> int:
+        return self._per_user.get(user_id, 0)
+
+    def apply(self, event: ChangeEvent) -> None:
+        user_id = event.data.get("user_id")
+        match event.type:
+            case "created":
+                self._total += 1
+                self._add(user_id, 1)
+            case "deleted":
+                self._total -= 1
+                self._add(user_id, -1)
+            case "updated" if (previous_user_id := event.data.get("previous_user_id")) is not None:
+                self._add(previous_user_id, -1)
+                self._add(user_id, 1)
+
+    def _add(self, user_id: int | None, delta: int) -> None:
+        if user_id is None:
+            return
+        self._per_user[user_id] += delta
+        # keep the counter small, authors without posts are dropped
+        if self._per_user[user_id] <= 0:
+            del self._per_user[user_id]
+
+    def reset(self, per_user: dict[int, int]) -> None:
+        self._per_user = Counter({user_id: count for user_id, count in per_user.items() if count > 0})
+        self._total = sum(self._per_user.values())
+
+    # recount from the repository, then replay the events published while counting
+    # - a write committed before the count but published after it is counted twice until the next run
+    # - False when the ring buffer overflowed while counting, the counts are left as they were
+    async def reconcile(self) -> bool:
+        last_event_id = self.hub.last_event_id
+        per_user = await self.post_repository.count_by_user()
+        missed = self.hub.events_since(last_event_id)
+        if missed is None:
+            return False
+        self.reset(per_user)
+        for event in missed:
+            self.apply(event)
+        return True
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            # retry right away, the incremental counts keep serving meanwhile
+            for _ in range(RECONCILE_ATTEMPTS):
+                try:
+                    if await self.reconcile():
+                        break
+                    reason = "too many writes while counting"
+                except Exception as e:
+                    # database hiccup
+                    reason = repr(e)
+            else:
+                print(f"Post counters not reconciled after {RECONCILE_ATTEMPTS} attempts: {reason}")
+
+    def start(self, interval: float) -> None:
+        if not self._reconcile_task:
+            self._reconcile_task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        if task := self._reconcile_task:
+            self._reconcile_task = None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
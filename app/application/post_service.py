@@ -1,13 +1,29 @@
+from datetime import datetime
+from typing import AsyncIterator
 from app.domain.models.post import Post
+from app.domain.models.user import User
 from app.domain.repositories import PostRepository, UserRepository
-from app.domain.exceptions import UserNotFound, PostNotFound, Forbiden
+from app.domain.exceptions import UserNotFound, PostNotFound, InvalidFieldValue, TooManyExports
+from app.domain.repositories.post import POST_FIELDS
+from app.infra.tracing import traced
+from app.application.post_counters import PostCounters
 
 
 class PostService:
-    def __init__(self, post_repository: PostRepository, user_repository: UserRepository):
+    def __init__(
+        self,
+        post_repository: PostRepository,
+        user_repository: UserRepository,
+        post_counters: PostCounters,
+        max_concurrent_exports: int = 2,
+    ):
         self.post_repository = post_repository
         self.user_repository = user_repository
+        self.post_counters = post_counters
+        self.max_concurrent_exports = max_concurrent_exports
+        self._exports = 0
 
+    @traced()
     async def create_post(self, user_id: int, title: str) -> Post:
         if not (user := await self.user_repository.get_by_id(user_id)):
             # raise Exception("User not found")
@@ -16,54 +32,88 @@ class PostService:
         post = Post(title=title, user=user)
         return await self.post_repository.create(post)
 
+    @traced()
     async def get_post(self, post_id: int) -> Post:
-        if not (post := await self.post_repository.get_by_id(post_id)):
+        # post and author are loaded together
+        if not (post := await self.post_repository.get_by_id_with_user(post_id)):
             # raise Exception("Post not found")
             raise PostNotFound(post_id=post_id)
 
-        # https://mypy.readthedocs.io/en/latest/error_code_list.html#code-union-attr
-        assert post.user
-        if not (user := await self.user_repository.get_by_id(post.user.user_id)):
-            # raise Exception("User not found")
-            raise UserNotFound(user_id=post.user.user_id)
-
-        post.user = user
-
         return post
 
-    # TODO: pagination
-    async def list_posts(self) -> list[Post]:
-        posts = await self.post_repository.get_posts()
-
-        for post in posts:
-            # https://mypy.readthedocs.io/en/latest/error_code_list.html#code-union-attr
-            assert post.user
-            post.user = await self.user_repository.get_by_id(post.user.user_id)
+    # keyset pagination on post_id, after is the post_id of the last post of the previous page
+    @traced()
+    async def list_posts(self, after: int | None = None, limit: int | None = None) -> list[Post]:
+        return await self.post_repository.get_posts_with_user(after=after, limit=limit)
 
-        return posts
-
-    async def update_post(self, post_id: int, title: str, user_id: int) -> Post:
-        if not (post := await self.post_repository.get_by_id(post_id)):
+    # sparse fieldsets, only the requested fields are read
+    @traced()
+    async def get_post_fields(self, post_id: int, fields: frozenset[str]) -> dict:
+        self._validate_fields(fields)
+        if not (post := await self.post_repository.get_fields_by_id(post_id, fields)):
             # raise Exception("Post not found")
             raise PostNotFound(post_id=post_id)
 
-        # AuthZ
-        # https://mypy.readthedocs.io/en/latest/error_code_list.html#code-union-attr
-        assert post.user
-        if post.user.user_id != user_id:
-            # raise Exception("User not authorized")
-            raise Forbiden()
-
-        # https://mypy.readthedocs.io/en/latest/error_code_list.html#code-union-attr
-        assert post.user
-        if not (user := await self.user_repository.get_by_id(post.user.user_id)):
-            # raise Exception("User not found")
-            raise UserNotFound(user_id=user_id)
-
-        post.title = title
-        post = await self.post_repository.update(post)
-        post.user = user
         return post
 
+    @traced()
+    async def list_posts_fields(
+        self,
+        fields: frozenset[str],
+        after: int | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        self._validate_fields(fields)
+        return await self.post_repository.get_posts_fields(fields, after=after, limit=limit)
+
+    @traced()
+    async def update_post(
+        self,
+        post_id: int,
+        title: str,
+        user_id: int,
+        expected_updated: datetime | None = None,
+    ) -> Post:
+        # existence, AuthZ and optimistic concurrency are checked by the repository,
+        # the post comes back with its author
+        # raises PostNotFound, Forbiden or PostConflict
+        return await self.post_repository.update_title_if_owner(
+            post_id=post_id,
+            user_id=user_id,
+            title=Post.validate_title(title),
+            expected_updated=expected_updated,
+        )
+
+    @traced()
     async def delete_post(self, post_id: int) -> None:
         await self.post_repository.delete(post_id)
+
+    # aggregates are served from memory, no COUNT(*) per request
+    def count_posts(self) -> int:
+        return self.post_counters.total
+
+    @traced()
+    async def get_user_stats(self, user_id: int) -> tuple[User, int]:
+        if not (user := await self.user_repository.get_by_id(user_id)):
+            # raise Exception("User not found")
+            raise UserNotFound(user_id=user_id)
+
+        return user, self.post_counters.count_for(user_id)
+
+    # batches of raw rows, see EXPORT_COLUMNS for the column order
+    # exports hold a dedicated connection each, the ones over the limit are turned away
+    # the slot is taken when the first batch is requested
+    async def export_posts(self, batch_size: int) -> AsyncIterator[list[tuple]]:
+        if self._exports >= self.max_concurrent_exports:
+            raise TooManyExports()
+        self._exports += 1
+        try:
+            async for rows in self.post_repository.export_rows(batch_size):
+                yield rows
+        finally:
+            self._exports -= 1
+
+    @staticmethod
+    def _validate_fields(fields: frozenset[str]) -> None:
+        if not fields or not fields <= set(POST_FIELDS):
+            raise InvalidFieldValue(field_name="fields", field_value=",".join(sorted(fields)))
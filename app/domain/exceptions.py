@@ -39,3 +39,18 @@ class PostNotFound(DomainException):
 class Forbiden(DomainException):
     TYPE = "forbidden"
     MESSAGE = "Access Forbidden"
+
+
+class PostConflict(DomainException):
+    TYPE = "post_conflict"
+    MESSAGE = "Post {post_id} was modified by someone else"
+
+
+class TooManyExports(DomainException):
+    TYPE = "too_many_exports"
+    MESSAGE = "Too many exports running, retry later"
+
+
+class DeadlineExceeded(DomainException):
+    TYPE = "deadline_exceeded"
+    MESSAGE = "Request deadline exceeded"
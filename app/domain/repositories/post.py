@@ -1,6 +1,14 @@
 from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator
 from app.domain.models.post import Post
 
+# column order of the rows returned by PostRepository.export_rows
+EXPORT_COLUMNS = ("post_id", "title", "created", "updated", "user_id")
+
+# fields a projection can ask for, "user" is the author (user_id, email, created)
+POST_FIELDS = ("post_id", "title", "created", "updated", "user")
+
 
 class PostRepository(ABC):
     @abstractmethod
@@ -9,11 +17,54 @@ class PostRepository(ABC):
     @abstractmethod
     async def get_by_id(self, post_id: int) -> Post | None: ...
 
+    # same as get_by_id, with the author loaded along with the post
+    @abstractmethod
+    async def get_by_id_with_user(self, post_id: int) -> Post | None: ...
+
+    # keyset pagination, posts ordered by post_id, starting after the cursor
+    @abstractmethod
+    async def get_posts(self, after: int | None = None, limit: int | None = None) -> list[Post]: ...
+
+    # same as get_posts, with the authors loaded along with the posts
+    @abstractmethod
+    async def get_posts_with_user(self, after: int | None = None, limit: int | None = None) -> list[Post]: ...
+
+    # projections only read the requested fields and return them as a dict
+    # the author is only loaded when "user" is requested
     @abstractmethod
-    async def get_posts(self) -> list[Post]: ...
+    async def get_fields_by_id(self, post_id: int, fields: frozenset[str]) -> dict | None: ...
+
+    @abstractmethod
+    async def get_posts_fields(
+        self,
+        fields: frozenset[str],
+        after: int | None = None,
+        limit: int | None = None,
+    ) -> list[dict]: ...
 
     @abstractmethod
     async def update(self, post: Post) -> Post: ...
 
+    # atomic update guarded by ownership and, if given, by the last seen `updated` (optimistic concurrency)
+    # raises PostNotFound, Forbiden or PostConflict when nothing was updated
+    # returns the updated post with its author
+    @abstractmethod
+    async def update_title_if_owner(
+        self,
+        post_id: int,
+        user_id: int,
+        title: str,
+        expected_updated: datetime | None = None,
+    ) -> Post: ...
+
+    # returns the deleted post, None if there was none
+    @abstractmethod
+    async def delete(self, post_id: int) -> Post | None: ...
+
+    # number of posts per author, read from the source of truth
+    @abstractmethod
+    async def count_by_user(self) -> dict[int, int]: ...
+
+    # raw rows in batches, for bulk reads that must not build domain models
     @abstractmethod
-    async def delete(self, post_id: int) -> None: ...
+    def export_rows(self, batch_size: int) -> AsyncIterator[list[tuple]]: ...
@@ -1,7 +1,12 @@
 from abc import ABC, abstractmethod
+from typing import Iterable
 from app.domain.models.user import User
 
 
 class UserRepository(ABC):
     @abstractmethod
     async def get_by_id(self, user_id: int) -> User | None: ...
+
+    # batch lookup, missing users are left out
+    @abstractmethod
+    async def get_by_ids(self, user_ids: Iterable[int]) -> dict[int, User]: ...
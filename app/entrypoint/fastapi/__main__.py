@@ -1,10 +1,12 @@
 import uvicorn
+from uvicorn.supervisors import ChangeReload
 from app.config.config import config
+from app.entrypoint.fastapi.server import Server
 
 if __name__ == "__main__":
     # Uvicorn is a lightning-fast ASGI server
     # https://www.uvicorn.org/settings/
-    uvicorn.run(
+    uvicorn_config = uvicorn.Config(
         # pkg.module:app_factory_funcName
         "app.entrypoint.fastapi.factory:create_app",
         host="0.0.0.0",
@@ -13,4 +15,14 @@ if __name__ == "__main__":
         reload=config.app.reload,  # hot reload
         reload_dirs=["app"],  # dir to watch for changes
         factory=True,  # indicates the app is created using a factory function
+        # the app drained already when uvicorn stops listening, requests still running are cancelled after this
+        timeout_graceful_shutdown=config.shutdown.cancel_timeout,
     )
+    # runs the exit hooks of the app on the stop signal, see server.py
+    server = Server(config=uvicorn_config, exit_delay=config.shutdown.readiness_delay)
+    if uvicorn_config.should_reload:
+        # the server runs in a subprocess restarted on changes, as uvicorn.run does
+        sock = uvicorn_config.bind_socket()
+        ChangeReload(uvicorn_config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
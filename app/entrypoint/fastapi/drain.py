@@ -0,0 +1,59 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# expose
+__all__ = ("Drain", )
+
+
+# in-flight requests of the app while the server stops
+# - started on the stop signal, the server keeps listening until they are done or the budget ran out
+# - requests still running after that are cancelled by uvicorn and counted as abandoned
+class Drain:
+    def __init__(self) -> None:
+        self.draining = False
+        # monotonic time the drain started at, the shutdown budget runs from there
+        self.started_at: float | None = None
+        self._in_flight = 0
+        self._abandoned = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def abandoned(self) -> int:
+        return self._abandoned
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            yield
+        except asyncio.CancelledError:
+            # cut off at the end of the graceful wait
+            if self.draining:
+                self._abandoned += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.set()
+
+    # readiness turns not ready and new requests are rejected from here on
+    def start(self) -> None:
+        if not self.draining:
+            self.draining = True
+            self.started_at = time.monotonic()
+
+    # wait for the in-flight requests to finish, returns how many are still running after the timeout
+    async def wait(self, timeout: float) -> int:
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=max(0.0, timeout))
+        except TimeoutError:
+            pass
+        return self._in_flight
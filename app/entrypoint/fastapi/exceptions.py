@@ -13,6 +13,9 @@ EXCEPTION_STATUS_MAPPING: dict[DomainExceptionType, int] = {
     domain_exceptions.PostNotFound: status.HTTP_404_NOT_FOUND,
     domain_exceptions.InvalidFieldValue: status.HTTP_400_BAD_REQUEST,
     domain_exceptions.Forbiden: status.HTTP_403_FORBIDDEN,
+    domain_exceptions.PostConflict: status.HTTP_409_CONFLICT,
+    domain_exceptions.TooManyExports: status.HTTP_503_SERVICE_UNAVAILABLE,
+    domain_exceptions.DeadlineExceeded: status.HTTP_504_GATEWAY_TIMEOUT,
 }
 
 
@@ -0,0 +1,130 @@
+import csv
+import io
+from enum import StrEnum
+from typing import AsyncIterator
+from app.domain.repositories.post import EXPORT_COLUMNS
+
+# pyarrow is in the requirements, without it only csv is available
+# https://arrow.apache.org/docs/python/install.html
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.ipc  # type: ignore  # noqa: F401
+    import pyarrow.parquet as pq  # type: ignore
+except ImportError:
+    pa = None
+    pq = None
+
+# expose
+__all__ = ("ExportFormat", "is_available", "encode", )
+
+
+class ExportFormat(StrEnum):
+    ARROW = "arrow"
+    PARQUET = "parquet"
+    CSV = "csv"
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self]
+
+
+MEDIA_TYPES = {
+    ExportFormat.ARROW: "application/vnd.apache.arrow.stream",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+    ExportFormat.CSV: "text/csv",
+}
+
+if pa:
+    SCHEMA = pa.schema([
+        ("post_id", pa.uint64()),
+        ("title", pa.string()),
+        ("created", pa.timestamp("us")),
+        ("updated", pa.timestamp("us")),
+        ("user_id", pa.uint32()),
+    ])
+    assert tuple(SCHEMA.names) == EXPORT_COLUMNS
+
+
+# columnar formats need pyarrow
+def is_available(export_format: ExportFormat) -> bool:
+    return export_format == ExportFormat.CSV or pa is not None
+
+
+# encode batches of raw rows, one chunk is yielded per batch so memory stays bounded
+def encode(export_format: ExportFormat, batches: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    match export_format:
+        case ExportFormat.ARROW:
+            return _encode_arrow(batches)
+        case ExportFormat.PARQUET:
+            return _encode_parquet(batches)
+        case _:
+            return _encode_csv(batches)
+
+
+# file-like object handed to the pyarrow writers, collects the bytes until drained
+class _ChunkSink(io.RawIOBase):
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    # parquet writer keeps track of offsets
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _to_record_batch(rows: list[tuple]):
+    # rows to columns
+    columns = zip(*rows)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, SCHEMA)],
+        schema=SCHEMA,
+    )
+
+
+# https://arrow.apache.org/docs/format/Columnar.html#ipc-streaming-format
+async def _encode_arrow(batches: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, SCHEMA) as writer:
+        async for rows in batches:
+            writer.write_batch(_to_record_batch(rows))
+            yield sink.drain()
+    # end of stream marker
+    yield sink.drain()
+
+
+# each batch is written as a row group, the footer comes last
+async def _encode_parquet(batches: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, SCHEMA) as writer:
+        async for rows in batches:
+            writer.write_batch(_to_record_batch(rows))
+            if chunk := sink.drain():
+                yield chunk
+    yield sink.drain()
+
+
+async def _encode_csv(batches: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        # reuse the buffer
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -1,24 +1,65 @@
+import time
 from typing import AsyncGenerator
 from fastapi import FastAPI
 from fastapi.concurrency import asynccontextmanager
 from app.entrypoint.fastapi.routers import routers
 from app.config.config import config
-from app.application import application_startup, application_shutdown
+from app.application import application_startup, application_shutdown, application_close_streams
 from app.entrypoint.fastapi.exceptions import setup_exceptions_handler
+from app.entrypoint.fastapi.middlewares import (
+    TracingMiddleware,
+    RateLimitMiddleware,
+    DrainMiddleware,
+    DeadlineMiddleware,
+)
+from app.entrypoint.fastapi.drain import Drain
+from app.entrypoint.fastapi.server import on_exit
+from app.infra.rate_limit import RateLimit, TokenBucketStore
 
 
 __all__ = ("create_app", )
 
 
 def create_app() -> FastAPI:
+    rate_limit_conf = config["rate_limit"]
+    rate_limit_store = TokenBucketStore(
+        shards=rate_limit_conf["shards"],
+        max_keys_per_shard=rate_limit_conf["max_keys_per_shard"],
+        idle_ttl=rate_limit_conf["idle_ttl"],
+    ) if rate_limit_conf["enabled"] else None
+    shutdown_conf = config["shutdown"]
+    drain = Drain()
 
     async def on_startup(app: FastAPI) -> None:
         print("Starting up")
         await application_startup()
+        if rate_limit_store is not None:
+            rate_limit_store.start_eviction(interval=rate_limit_conf["eviction_interval"])
+
+    # on the stop signal, see server.py
+    async def on_stop() -> None:
+        print("Draining")
+        # readiness reports not ready, new requests get 503 and change streams end
+        drain.start()
+        application_close_streams()
+        # in-flight requests get the drain budget, the server keeps listening meanwhile
+        if running := await drain.wait(timeout=shutdown_conf["drain_timeout"]):
+            print(f"{running} request(s) still running after the drain timeout")
 
     async def on_shutdown(app: FastAPI) -> None:
         print("Shutting down")
-        await application_shutdown()
+        # after the drain when stopped by a signal, started here when the server stops otherwise
+        drain.start()
+        if rate_limit_store is not None:
+            await rate_limit_store.stop_eviction()
+        # pooled connections get what is left of the drain budget
+        assert drain.started_at is not None
+        remaining = drain.started_at + shutdown_conf["drain_timeout"] - time.monotonic()
+        terminated = await application_shutdown(timeout=max(0.0, remaining))
+        print(
+            f"Drained in {time.monotonic() - drain.started_at:.3f}s, "
+            f"{drain.abandoned} request(s) abandoned, {terminated} connection(s) terminated"
+        )
 
     @asynccontextmanager
     async def lifespan(app: FastAPI) -> AsyncGenerator:
@@ -34,10 +75,39 @@ def create_app() -> FastAPI:
         version=config.app.version,
         lifespan=lifespan,
     )
+    # read by the readiness probe
+    app.state.drain = drain
+    on_exit(on_stop)
 
     for router in routers:
         app.include_router(router)
 
     setup_exceptions_handler(app)
 
+    # https://fastapi.tiangolo.com/advanced/middleware/
+    # the last added middleware is the outermost one
+    deadlines_conf = config["deadlines"]
+    if deadlines_conf["enabled"]:
+        app.add_middleware(
+            DeadlineMiddleware,
+            default=deadlines_conf["default"],
+            routes=dict(deadlines_conf.get("routes", {})),
+            header=deadlines_conf["header"],
+            exempt=tuple(deadlines_conf["exempt"]),
+        )
+    if rate_limit_store is not None:
+        app.add_middleware(
+            RateLimitMiddleware,
+            store=rate_limit_store,
+            default=RateLimit(**rate_limit_conf["default"]),
+            routes={
+                route: RateLimit(**limit)
+                for route, limit in rate_limit_conf.get("routes", {}).items()
+            },
+            exempt=tuple(rate_limit_conf["exempt"]),
+        )
+    app.add_middleware(TracingMiddleware)
+    # outermost, rejected requests cost neither a span nor a token
+    app.add_middleware(DrainMiddleware, drain=drain, exempt=tuple(shutdown_conf["exempt"]))
+
     return app
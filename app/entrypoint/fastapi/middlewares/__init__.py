@@ -0,0 +1,7 @@
+from .tracing import TracingMiddleware
+from .rate_limit import RateLimitMiddleware
+from .drain import DrainMiddleware
+from .deadline import DeadlineMiddleware
+
+# controls which symbols should be exported when from 'module import *' is used
+__all__ = ("TracingMiddleware", "RateLimitMiddleware", "DrainMiddleware", "DeadlineMiddleware")
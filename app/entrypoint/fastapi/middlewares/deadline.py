@@ -0,0 +1,73 @@
+import asyncio
+from fastapi import status
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.domain.exceptions import DeadlineExceeded
+from app.entrypoint.fastapi.middlewares.routing import route_path
+from app.infra.deadline import deadline_scope
+
+# expose
+__all__ = ("DeadlineMiddleware", )
+
+
+# pure ASGI middleware, every request runs within a time budget
+# - the budget comes from the request header (seconds), capped by the route's budget
+# - it is carried in a contextvar down to the pool and the queries, see app.infra.deadline
+# - whatever still runs when it is spent is cancelled and answered with 504
+class DeadlineMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        default: float,
+        routes: dict[str, float] | None = None,
+        header: str = "x-request-timeout",
+        exempt: tuple[str, ...] = (),
+    ) -> None:
+        self.app = app
+        self.default = default
+        # keyed by "<METHOD> <path template>", e.g. "GET /posts/{post_id}"
+        self.routes = routes or {}
+        self.header = header
+        self.exempt = exempt
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+
+        timeout = self._timeout(scope)
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            with deadline_scope(timeout):
+                async with asyncio.timeout(timeout):
+                    await self.app(scope, receive, send_wrapper)
+        except TimeoutError:
+            # too late to answer once the response is on its way, the connection is dropped
+            if response_started:
+                raise
+            exc = DeadlineExceeded()
+            response = ORJSONResponse(
+                content={
+                    "error": exc.message,
+                    "type": exc.TYPE,
+                },
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            )
+            await response(scope, receive, send)
+
+    # the client may ask for less time than the route allows, never for more
+    def _timeout(self, scope: Scope) -> float:
+        timeout = self.routes.get(f"{scope['method']} {route_path(scope)}", self.default)
+        try:
+            requested = float(Headers(scope=scope).get(self.header, "inf"))
+        except ValueError:
+            return timeout
+        return min(timeout, requested) if requested > 0 else timeout
@@ -0,0 +1,40 @@
+from fastapi import status
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.entrypoint.fastapi.drain import Drain
+
+# expose
+__all__ = ("DrainMiddleware", )
+
+
+# pure ASGI middleware, counts in-flight requests and turns new ones away while draining
+# exempt paths (health checks) keep being served, readiness reports the drain
+class DrainMiddleware:
+    def __init__(self, app: ASGIApp, drain: Drain, exempt: tuple[str, ...] = ()) -> None:
+        self.app = app
+        self.drain = drain
+        self.exempt = exempt
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+
+        if self.drain.draining:
+            response = ORJSONResponse(
+                content={
+                    "error": "Service Unavailable",
+                    "type": "draining",
+                },
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={
+                    "Retry-After": "1",
+                    # the client reconnects, hopefully to another instance
+                    "Connection": "close",
+                },
+            )
+            await response(scope, receive, send)
+            return
+
+        with self.drain.track():
+            await self.app(scope, receive, send)
@@ -0,0 +1,77 @@
+from fastapi import status
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.infra.rate_limit import RateLimit, Decision, TokenBucketStore
+from app.entrypoint.fastapi.middlewares.routing import route_path
+
+# expose
+__all__ = ("RateLimitMiddleware", )
+
+
+# pure ASGI middleware, one token bucket per client and per route
+# https://datatracker.ietf.org/doc/draft-ietf-httpapi-ratelimit-headers/
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: TokenBucketStore,
+        default: RateLimit,
+        routes: dict[str, RateLimit] | None = None,
+        exempt: tuple[str, ...] = (),
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.default = default
+        # keyed by "<METHOD> <path template>", e.g. "GET /posts/{post_id}"
+        self.routes = routes or {}
+        self.exempt = exempt
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+
+        route = f"{scope['method']} {route_path(scope)}"
+        decision = self.store.take(
+            f"{self._client_key(scope)}|{route}",
+            self.routes.get(route, self.default),
+        )
+
+        if not decision.allowed:
+            response = ORJSONResponse(
+                content={
+                    "error": "Too Many Requests",
+                    "type": "rate_limited",
+                },
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={
+                    **self._headers(decision),
+                    "Retry-After": str(decision.retry_after),
+                },
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(self._headers(decision))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    # peer ip, the only identity the app can trust
+    # headers like X-API-Key or X-User-Id are not authenticated here, a client rotating them
+    # would get a fresh bucket per request and flood the shards
+    @staticmethod
+    def _client_key(scope: Scope) -> str:
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    @staticmethod
+    def _headers(decision: Decision) -> dict[str, str]:
+        return {
+            "RateLimit-Limit": str(decision.limit),
+            "RateLimit-Remaining": str(decision.remaining),
+            "RateLimit-Reset": str(decision.reset_after),
+        }
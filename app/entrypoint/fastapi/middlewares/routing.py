@@ -0,0 +1,15 @@
+from starlette.routing import Match
+from starlette.types import Scope
+
+# expose
+__all__ = ("route_path", )
+
+
+# path template of the matching route, so /posts/1 and /posts/2 share the same settings
+def route_path(scope: Scope) -> str:
+    for route in scope["app"].routes:
+        match, _ = route.matches(scope)
+        if match is Match.FULL:
+            return route.path
+    # unknown paths share a single key
+    return "*"
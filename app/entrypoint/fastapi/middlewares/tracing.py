@@ -0,0 +1,37 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.infra.tracing import tracer
+from app.entrypoint.fastapi.middlewares.routing import route_path
+
+# expose
+__all__ = ("TracingMiddleware", )
+
+
+# pure ASGI middleware, opens the root span of every http request
+# https://www.starlette.io/middleware/#pure-asgi-middleware
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        method, path = scope["method"], scope["path"]
+        # named after the route template, span names stay a small fixed set
+        route = route_path(scope)
+        with tracer.start_trace(
+            f"{method} {route}",
+            traceparent=headers.get("traceparent"),
+            **{"http.request.method": method, "http.route": route, "url.path": path},
+        ) as root:
+            async def send_wrapper(message: Message) -> None:
+                if root and message["type"] == "http.response.start":
+                    root.set_attribute("http.response.status_code", message["status"])
+                    # echo the trace context so callers can find the trace
+                    MutableHeaders(scope=message).append("traceparent", root.traceparent)
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -1,8 +1,9 @@
 from .heatbeat import router as heartbeat_router
 from .posts import router as posts_router
+from .users import router as users_router
 
 # controls which symbols should be exported when from 'module import *' is used
-__all__ = ("heartbeat_router", "posts_router")
+__all__ = ("heartbeat_router", "posts_router", "users_router")
 
 # router lists included all imported routers
-routers = (heartbeat_router, posts_router)
+routers = (heartbeat_router, posts_router, users_router)
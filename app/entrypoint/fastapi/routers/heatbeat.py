@@ -1,4 +1,4 @@
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Request, status
 from fastapi.responses import JSONResponse
 from app.application import application_health_check
 
@@ -9,7 +9,12 @@ router = APIRouter(
 
 
 @router.get("/readiness", status_code=status.HTTP_200_OK)
-async def readiness() -> JSONResponse:
+async def readiness(request: Request) -> JSONResponse:
+    # not ready while draining, the load balancer stops routing traffic here
+    if request.app.state.drain.draining:
+        return JSONResponse({
+            "status": "draining"
+        }, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
     return JSONResponse({
         "status": "ready"
     })
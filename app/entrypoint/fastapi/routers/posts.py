@@ -1,13 +1,18 @@
-from fastapi import APIRouter, status
-from fastapi.responses import JSONResponse
+from typing import Annotated, AsyncIterator
+from fastapi import APIRouter, Header, Query, Request, Response, status
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 # from app.infra.persistence.mem_db.fake_database import fake_database
-from app.entrypoint.fastapi.schema.post import Post, PostCreateInput, PostUpdateInput
+from app.entrypoint.fastapi.schema.post import Post, PostFields, PostCount, PostCreateInput, PostUpdateInput
 from app.entrypoint.fastapi.schema.user import User
 from starlette.exceptions import HTTPException
 from app.application.dic import DIC
 from app.domain.models.post import Post as PostModel
 from app.domain.models.user import User as UserModel
 from app.domain.exceptions import UserNotFound, PostNotFound, InvalidFieldValue, Forbiden
+from app.infra.tracing import tracer, traced
+from app.entrypoint.fastapi.export import ExportFormat, is_available, encode
+from app.entrypoint.fastapi import sse
+from app.config.config import config
 
 # expose
 __all__ = ("router", )
@@ -17,29 +22,141 @@ router = APIRouter(
     tags=["posts"]
 )
 
+# sparse fieldsets, e.g. ?fields=post_id,title
+FieldsQuery = Annotated[
+    str | None,
+    Query(description="Comma separated fields to return: post_id, title, created, updated, user"),
+]
+
+# keyset pagination on post_id
+AfterQuery = Annotated[
+    int | None,
+    Query(description="post_id of the last post of the previous page"),
+]
+LimitQuery = Annotated[int, Query(ge=1, le=1000, description="Posts per page")]
+
 
 @router.get(
     "",
-    description="Get all posts",
-    response_model=list[Post],
+    description="Get posts ordered by id, one page at a time, the Link header points to the next page",
+    # PostFields with ?fields=
+    response_model=list[Post] | list[PostFields],
+    status_code=status.HTTP_200_OK,
+)
+@traced()
+async def list_posts(
+    request: Request,
+    response: Response,
+    fields: FieldsQuery = None,
+    after: AfterQuery = None,
+    limit: LimitQuery = 100,
+) -> list[Post] | ORJSONResponse:
+    assert DIC.post_service
+    if fields:
+        # projection, serialized as is without the response model
+        # post_id is the cursor, read even when not requested
+        requested = parse_fields(fields)
+        post_fields = await DIC.post_service.list_posts_fields(
+            requested | {"post_id"}, after=after, limit=limit
+        )
+        last_post_id = post_fields[-1]["post_id"] if post_fields else None
+        headers = next_page_headers(request, last_post_id, len(post_fields), limit)
+        if "post_id" not in requested:
+            for post in post_fields:
+                del post["post_id"]
+        with tracer.span("serialize", count=len(post_fields)):
+            return ORJSONResponse(post_fields, headers=headers)
+
+    posts: list[PostModel] = await DIC.post_service.list_posts(after=after, limit=limit)
+    response.headers.update(
+        next_page_headers(request, posts[-1].post_id if posts else None, len(posts), limit)
+    )
+    with tracer.span("serialize", count=len(posts)):
+        return [to_post_view_model(post) for post in posts]
+
+
+# declared before /{post_id} so the path is not captured as an id
+@router.get(
+    "/export",
+    description="Export all posts as Arrow IPC stream, Parquet or CSV",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def export_posts(
+    format: ExportFormat = ExportFormat.ARROW,
+    batch_size: int = Query(default=10_000, ge=1, le=100_000),
+) -> StreamingResponse:
+    assert DIC.post_service
+    if not is_available(format):
+        # rather than answer in another format than asked for
+        raise InvalidFieldValue(f"Export format {format} is not available on this server, use csv")
+    batches = DIC.post_service.export_posts(batch_size)
+    # read the first batch before the response starts,
+    # a full export slot (503) or a failing query still get their status code
+    first = await anext(batches, None)
+    return StreamingResponse(
+        encode(format, _prepend(first, batches)),
+        media_type=format.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="posts.{format}"',
+        },
+    )
+
+
+@router.get(
+    "/count",
+    description="Count all posts",
+    response_model=PostCount,
     status_code=status.HTTP_200_OK,
 )
-async def list_posts() -> list[Post]:
+async def count_posts() -> PostCount:
     assert DIC.post_service
-    posts: list[PostModel] = await DIC.post_service.list_posts()
-    return [to_post_view_model(post) for post in posts]
+    return PostCount(count=DIC.post_service.count_posts())
+
+
+# server-sent events, replaces polling GET /posts
+@router.get(
+    "/changes",
+    description="Stream post changes as server-sent events, resumable with Last-Event-ID",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def stream_changes(last_event_id: Annotated[str | None, Header()] = None) -> StreamingResponse:
+    assert DIC.change_hub
+    subscription = DIC.change_hub.subscribe(last_event_id=last_event_id)
+    return StreamingResponse(
+        sse.stream_events(
+            DIC.change_hub,
+            subscription,
+            keepalive_interval=config["change_feed"]["keepalive_interval"],
+        ),
+        media_type=sse.MEDIA_TYPE,
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # disable proxy buffering (nginx)
+        },
+    )
 
 
 @router.get(
     "/{post_id}",
     description="Get a post",
-    response_model=Post,
+    # PostFields with ?fields=
+    response_model=Post | PostFields,
     status_code=status.HTTP_200_OK,
 )
-async def get_post(post_id: int) -> Post:
+@traced()
+async def get_post(post_id: int, fields: FieldsQuery = None) -> Post | ORJSONResponse:
     assert DIC.post_service
+    if fields:
+        # projection, serialized as is without the response model
+        post_fields = await DIC.post_service.get_post_fields(post_id, parse_fields(fields))
+        with tracer.span("serialize"):
+            return ORJSONResponse(post_fields)
+
     post: PostModel = await DIC.post_service.get_post(post_id)
-    return to_post_view_model(post)
+    with tracer.span("serialize"):
+        return to_post_view_model(post)
 
 
 @router.post(
@@ -48,13 +165,15 @@ async def get_post(post_id: int) -> Post:
     response_model=Post,
     status_code=status.HTTP_201_CREATED,
 )
+@traced()
 async def create_post(input_post: PostCreateInput) -> Post:
     assert DIC.post_service
     post: PostModel = await DIC.post_service.create_post(
         user_id=input_post.user_id,
         title=input_post.title
     )
-    return to_post_view_model(post)
+    with tracer.span("serialize"):
+        return to_post_view_model(post)
 
 
 @router.patch(
@@ -63,14 +182,17 @@ async def create_post(input_post: PostCreateInput) -> Post:
     response_model=Post,
     status_code=status.HTTP_200_OK,
 )
+@traced()
 async def update_post(post_id: int, update_post: PostUpdateInput) -> Post:
     assert DIC.post_service
     post: PostModel = await DIC.post_service.update_post(
         post_id=post_id,
         title=update_post.title,
-        user_id=update_post.user_id
+        user_id=update_post.user_id,
+        expected_updated=update_post.updated,
     )
-    return to_post_view_model(post)
+    with tracer.span("serialize"):
+        return to_post_view_model(post)
 
 
 @router.delete(
@@ -78,17 +200,39 @@ async def update_post(post_id: int, update_post: PostUpdateInput) -> Post:
     description="Delete a post",
     status_code=status.HTTP_204_NO_CONTENT,
 )
+@traced()
 async def delete_post(post_id: int) -> None:
     assert DIC.post_service
     await DIC.post_service.delete_post(post_id)
 
 
+async def _prepend(first: list[tuple] | None, batches: AsyncIterator[list[tuple]]) -> AsyncIterator[list[tuple]]:
+    if first is None:
+        return
+    yield first
+    async for rows in batches:
+        yield rows
+
+
+# https://datatracker.ietf.org/doc/html/rfc8288, only when the page is full
+def next_page_headers(request: Request, last_post_id: int | None, count: int, limit: int) -> dict[str, str]:
+    if last_post_id is None or count < limit:
+        return {}
+    url = request.url.include_query_params(after=last_post_id, limit=limit)
+    return {"Link": f'<{url}>; rel="next"'}
+
+
+def parse_fields(fields: str) -> frozenset[str]:
+    return frozenset(field.strip() for field in fields.split(",") if field.strip())
+
+
 def to_post_view_model(post: PostModel) -> Post:
     assert post.user
     return Post(
         post_id=post.post_id,
         title=post.title,
         created=post.created,
+        updated=post.updated,
         user=to_user_view_model(post.user)
     )
 
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, status
+from app.entrypoint.fastapi.schema.user import UserStats
+from app.application.dic import DIC
+from app.infra.tracing import traced
+
+# expose
+__all__ = ("router", )
+
+router = APIRouter(
+    prefix="/users",
+    tags=["users"]
+)
+
+
+@router.get(
+    "/{user_id}/stats",
+    description="Get the stats of a user",
+    response_model=UserStats,
+    status_code=status.HTTP_200_OK,
+)
+@traced()
+async def get_user_stats(user_id: int) -> UserStats:
+    assert DIC.post_service
+    user, post_count = await DIC.post_service.get_user_stats(user_id)
+    return UserStats(user_id=user.user_id, post_count=post_count)
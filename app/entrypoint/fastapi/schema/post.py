@@ -7,9 +7,23 @@ class Post(BaseModel):
     post_id: int | None = None
     title: str
     created: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    updated: datetime = Field(default_factory=lambda: datetime.now(UTC))
     user: User
 
 
+# sparse fieldset (?fields=), only the requested fields are sent
+class PostFields(BaseModel):
+    post_id: int | None = None
+    title: str | None = None
+    created: datetime | None = None
+    updated: datetime | None = None
+    user: User | None = None
+
+
+class PostCount(BaseModel):
+    count: int
+
+
 class PostCreateInput(BaseModel):
     title: str
     user_id: int
@@ -19,3 +33,5 @@ class PostUpdateInput(BaseModel):
     title: str
     # TODO
     user_id: int
+    # last seen `updated`, the update is rejected with 409 if the post changed since
+    updated: datetime | None = None
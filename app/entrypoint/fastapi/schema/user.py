@@ -6,3 +6,8 @@ class User(BaseModel):
     user_id: int
     email: str | None = None
     created: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+
+class UserStats(BaseModel):
+    user_id: int
+    post_count: int
@@ -0,0 +1,52 @@
+import asyncio
+from types import FrameType
+from typing import Awaitable, Callable
+import uvicorn
+
+# expose
+__all__ = ("Server", "on_exit", )
+
+# awaited on the event loop when the server is asked to stop
+_exit_hooks: list[Callable[[], Awaitable[None]]] = []
+
+
+# register a hook run on the stop signal (SIGTERM, SIGINT)
+# - before uvicorn stops listening and waits for the open connections
+# - long-lived responses (change streams) have to end here, or that wait runs until its timeout
+# - uvicorn stops once every hook returned, the lifespan shutdown only runs after that
+def on_exit(hook: Callable[[], Awaitable[None]]) -> None:
+    _exit_hooks.append(hook)
+
+
+# uvicorn server running the exit hooks on the first stop signal
+# - keeps listening for at least exit_delay, a load balancer polling the readiness probe sees it fail
+#   and stops routing traffic here before the listeners close
+# - a second signal stops right away
+# https://www.uvicorn.org/deployment/#running-programmatically
+class Server(uvicorn.Server):
+    def __init__(self, config: uvicorn.Config, exit_delay: float = 0.0) -> None:
+        super().__init__(config)
+        self.exit_delay = exit_delay
+        self._exiting = False
+        self._exit_task: asyncio.Task | None = None
+
+    def handle_exit(self, sig: int, frame: FrameType | None) -> None:
+        if self._exiting or self.should_exit:
+            super().handle_exit(sig, frame)
+            return
+        self._exiting = True
+        # signal handler, schedule the exit on the loop rather than run it in between
+        asyncio.get_running_loop().call_soon_threadsafe(self._start_exit, sig, frame)
+
+    def _start_exit(self, sig: int, frame: FrameType | None) -> None:
+        self._exit_task = asyncio.create_task(self._exit(sig, frame))
+
+    async def _exit(self, sig: int, frame: FrameType | None) -> None:
+        # a failing hook must not keep the server from stopping
+        await asyncio.gather(
+            asyncio.sleep(self.exit_delay),
+            *(hook() for hook in _exit_hooks),
+            return_exceptions=True,
+        )
+        if not self.should_exit:
+            super().handle_exit(sig, frame)
@@ -0,0 +1,39 @@
+import asyncio
+from typing import AsyncIterator
+import orjson
+from app.infra.events import BroadcastHub, ChangeEvent, Subscription
+
+# expose
+__all__ = ("MEDIA_TYPE", "stream_events", )
+
+# https://html.spec.whatwg.org/multipage/server-sent-events.html
+MEDIA_TYPE = "text/event-stream"
+RETRY_MS = 3000
+
+
+def encode_event(event: ChangeEvent) -> bytes:
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (
+        event.id.encode(),
+        event.type.encode(),
+        orjson.dumps(event.data),
+    )
+
+
+# stream a subscription as server-sent events until it is closed or the client goes away
+async def stream_events(hub: BroadcastHub, subscription: Subscription, keepalive_interval: float) -> AsyncIterator[bytes]:
+    try:
+        # reconnect delay for the browser EventSource
+        yield b"retry: %d\n\n" % RETRY_MS
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=keepalive_interval)
+            except TimeoutError:
+                # comment line, keeps proxies from closing an idle connection
+                yield b": keepalive\n\n"
+                continue
+            # closed by the hub, dropped subscribers reconnect with Last-Event-ID
+            if event is None:
+                return
+            yield encode_event(event)
+    finally:
+        hub.unsubscribe(subscription)
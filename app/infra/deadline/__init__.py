@@ -0,0 +1 @@
+from app.infra.deadline.deadline import deadline_scope, remaining, check
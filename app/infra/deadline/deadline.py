@@ -0,0 +1,39 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+from app.domain.exceptions import DeadlineExceeded
+
+# expose
+__all__ = ("deadline_scope", "remaining", "check", )
+
+# absolute deadline (time.monotonic) of the current request
+# every asyncio task gets a copy of the context, so gathered queries share the budget
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+# run the block within timeout seconds, a nested scope can only shorten the budget
+@contextmanager
+def deadline_scope(timeout: float | None) -> Iterator[None]:
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    if (current := _deadline.get()) is not None and (deadline is None or current < deadline):
+        deadline = current
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+# seconds left, None without a deadline
+def remaining() -> float | None:
+    if (deadline := _deadline.get()) is None:
+        return None
+    return deadline - time.monotonic()
+
+
+# seconds left, raises once the budget is spent
+def check() -> float | None:
+    if (left := remaining()) is not None and left <= 0:
+        raise DeadlineExceeded()
+    return left
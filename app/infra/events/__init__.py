@@ -0,0 +1 @@
+from app.infra.events.hub import ChangeEvent, Subscription, BroadcastHub
@@ -0,0 +1,134 @@
+import asyncio
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+# expose
+__all__ = ("ChangeEvent", "Subscription", "BroadcastHub", )
+
+
+@dataclass(frozen=True, slots=True)
+class ChangeEvent:
+    event_id: int
+    type: str  # created | updated | deleted | reset
+    data: dict[str, Any] = field(default_factory=dict)
+    # boot of the hub that numbered the event, ids restart from 1 on every boot
+    epoch: str = ""
+
+    # id sent to subscribers, "<epoch>-<event_id>"
+    @property
+    def id(self) -> str:
+        return f"{self.epoch}-{self.event_id}"
+
+
+# sent when a subscriber cannot be resumed and has to reload its state
+RESET = "reset"
+
+
+@dataclass(eq=False)
+class Subscription:
+    queue: asyncio.Queue
+    # events replayed from the ring buffer, delivered before the live ones
+    backlog: deque = field(default_factory=deque)
+    # set when the subscriber fell behind and was disconnected
+    dropped: bool = False
+
+    # next event, None once the subscription is closed
+    async def get(self) -> ChangeEvent | None:
+        if self.backlog:
+            return self.backlog.popleft()
+        return await self.queue.get()
+
+
+# in-process fan-out of change events
+# - every subscriber has its own bounded queue, publishing never waits on a subscriber
+# - a subscriber whose queue is full is dropped, it can resume with the last event id it saw
+# - event ids carry the epoch of the hub, an id from another boot (restart, other instance) gets a reset
+# - the last history_size events are kept in a ring buffer to resume from
+# - listeners are called synchronously on publish, for in-process state kept up to date by events
+class BroadcastHub:
+    def __init__(self, history_size: int = 1024, queue_size: int = 256, epoch: str | None = None) -> None:
+        # boot time, unique enough across restarts and instances
+        self.epoch = epoch or f"{time.time_ns():x}"
+        self._history: deque[ChangeEvent] = deque(maxlen=history_size)
+        self._queue_size = queue_size
+        self._subscriptions: set[Subscription] = set()
+        self._ids = itertools.count(1)
+        self._listeners: list[Callable[[ChangeEvent], None]] = []
+        self._closed = False
+
+    @property
+    def last_event_id(self) -> int:
+        return self._history[-1].event_id if self._history else 0
+
+    def publish(self, type: str, data: dict[str, Any]) -> ChangeEvent:
+        event = ChangeEvent(event_id=next(self._ids), type=type, data=data, epoch=self.epoch)
+        self._history.append(event)
+        for listener in self._listeners:
+            listener(event)
+        for subscription in list(self._subscriptions):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+        return event
+
+    # events published after event_id, None once the ring buffer no longer reaches back that far
+    def events_since(self, event_id: int) -> list[ChangeEvent] | None:
+        oldest = self._history[0].event_id if self._history else self.last_event_id + 1
+        if event_id < oldest - 1:
+            return None
+        return [event for event in self._history if event.event_id > event_id]
+
+    def add_listener(self, listener: Callable[[ChangeEvent], None]) -> None:
+        self._listeners.append(listener)
+
+    # last_event_id is the id of the last event the subscriber saw, see ChangeEvent.id
+    def subscribe(self, last_event_id: str | None = None) -> Subscription:
+        subscription = Subscription(queue=asyncio.Queue(maxsize=self._queue_size))
+        if self._closed:
+            # shutting down, the subscriber reconnects to another instance
+            subscription.queue.put_nowait(None)
+            return subscription
+        if last_event_id is not None:
+            seq = self._parse_event_id(last_event_id)
+            missed = self.events_since(seq) if seq is not None and seq <= self.last_event_id else None
+            if missed is not None:
+                # resume, replay what was missed
+                subscription.backlog.extend(missed)
+            else:
+                # too old, from another boot or malformed
+                subscription.backlog.append(
+                    ChangeEvent(event_id=self.last_event_id, type=RESET, epoch=self.epoch)
+                )
+        self._subscriptions.add(subscription)
+        return subscription
+
+    # sequence number of an event id of this boot, None otherwise
+    def _parse_event_id(self, event_id: str) -> int | None:
+        epoch, _, seq = event_id.rpartition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    # end all subscriptions and the ones to come, e.g. on shutdown
+    def close(self) -> None:
+        self._closed = True
+        for subscription in list(self._subscriptions):
+            self._close(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        subscription.dropped = True
+        self._close(subscription)
+
+    def _close(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+        # make room for the end marker, the subscriber resumes from the ring buffer anyway
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
@@ -1,6 +1,7 @@
 from dataclasses import dataclass, field
 from datetime import datetime
 import random
+from app.infra.persistence.mem_db.storage import StorageEngine
 
 # expose
 __all__ = ("fake_database", "FakeDatabase", )
@@ -11,10 +12,22 @@ __all__ = ("fake_database", "FakeDatabase", )
 class FakeDatabase:
     posts: dict = field(default_factory=dict)  # each filed is a table
     users: dict = field(default_factory=dict)
+    # last id handed out per table, ids are never reused, not even after a delete
+    sequences: dict = field(default_factory=dict)
+    # durable storage, without it the tables only live in memory
+    storage: StorageEngine | None = None
 
     # called after __init__ to populate the tables
     def __post_init__(self):
-        self.users = {
+        if self.storage:
+            # tables log every mutation to the storage engine
+            tables = self.storage.open()
+            self.users, self.posts, self.sequences = tables["users"], tables["posts"], tables["sequences"]
+            # fixtures only on first start
+            if self.users or self.posts:
+                return
+
+        self.users.update({
             # dict comprehension
             user_id: {
                 "user_id": user_id,
@@ -23,8 +36,8 @@ class FakeDatabase:
                 "updated": datetime.utcnow(),
             }
             for user_id in range(1, 6)
-        }
-        self.posts = {
+        })
+        self.posts.update({
             post_id: {
                 "post_id": post_id,
                 "title": f"FastAPI tutorial {post_id}",
@@ -33,7 +46,22 @@ class FakeDatabase:
                 "user_id": random.choice(list(self.users.keys())),
             }
             for post_id in range(1, 6)
-        }
+        })
+
+    # next id of a table, persisted with the tables when the storage is durable
+    def next_id(self, table: str) -> int:
+        if sequence := self.sequences.get(table):
+            last_id = sequence["last_id"]
+        else:
+            # first id handed out, continue after the existing rows
+            last_id = max(getattr(self, table), default=0)
+        self.sequences[table] = {"last_id": last_id + 1}
+        return last_id + 1
+
+    # wait until the writes so far are durable, see StorageEngine.commit
+    async def commit(self) -> None:
+        if self.storage:
+            await self.storage.commit()
 
 
 fake_database = FakeDatabase()
@@ -0,0 +1,339 @@
+import asyncio
+import mmap
+import os
+import pickle
+import struct
+import zlib
+from pathlib import Path
+from typing import Any
+
+# expose
+__all__ = ("StorageEngine", "LoggedTable", )
+
+# durable storage for the in-memory tables
+# - every mutation is appended to a write ahead log (wal.<generation>.log)
+# - appends are group committed: one write + fsync every commit_interval for all pending records,
+#   writers await commit() and are acknowledged once their group is on disk
+# - once the log grows past compact_threshold, the tables are dumped into a snapshot
+#   and the logs it covers are removed, in its own task: groups keep being committed meanwhile
+# - startup memory maps the snapshot and replays the logs written after it
+# https://en.wikipedia.org/wiki/Write-ahead_logging
+SNAPSHOT_MAGIC = b"MEMDBSS2"
+SNAPSHOT_HEADER = struct.Struct("<8sQ")  # magic, first log generation to replay
+RECORD_HEADER = struct.Struct("<II")  # payload length, crc32
+TABLES = ("users", "posts", "sequences")
+
+
+def _frame(payload: bytes) -> bytes:
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+# row of a LoggedTable, every change is logged as a put of the whole row
+# so replaying the log is idempotent
+# no __init__ and slots only, wrapping a row is a C level copy
+class LoggedRow(dict):
+    __slots__ = ("_table", "_key")
+
+    _table: "LoggedTable"
+    _key: Any
+
+    # snapshots keep plain dicts, dict(row) is a single C level copy
+    # and consistent even while the event loop mutates the row
+    def __reduce__(self) -> tuple:
+        return dict, (dict(self),)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        super().__setitem__(key, value)
+        self._table.log_put(self._key, self)
+
+    def update(self, *args, **kwargs) -> None:
+        super().update(*args, **kwargs)
+        self._table.log_put(self._key, self)
+
+
+# dict logging its mutations, repositories keep using it as a plain dict
+# rows are loaded as plain dicts and wrapped into LoggedRows when first handed out
+# by [] / get / pop, so startup costs one unpickle and nothing per row;
+# values() and items() are for reading, they may yield plain dicts
+class LoggedTable(dict):
+    def __init__(self, name: str, engine: "StorageEngine") -> None:
+        super().__init__()
+        self.name = name
+        self._engine = engine
+
+    def _row(self, key: Any, row: dict) -> LoggedRow:
+        logged = LoggedRow(row)
+        logged._table, logged._key = self, key
+        return logged
+
+    def _wrap(self, key: Any, row: dict) -> LoggedRow:
+        if type(row) is not LoggedRow:
+            row = self._row(key, row)
+            super().__setitem__(key, row)
+        return row
+
+    def __getitem__(self, key: Any) -> LoggedRow:
+        return self._wrap(key, super().__getitem__(key))
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if (row := super().get(key)) is None:
+            return default
+        return self._wrap(key, row)
+
+    # loading from the snapshot or the logs, nothing is logged
+    def load(self, key: Any, row: dict) -> None:
+        super().__setitem__(key, row)
+
+    def load_all(self, rows: dict) -> None:
+        super().update(rows)
+
+    def discard(self, key: Any) -> None:
+        super().pop(key, None)
+
+    def log_put(self, key: Any, row: dict) -> None:
+        self._engine.append(("put", self.name, key, dict(row)))
+
+    def __setitem__(self, key: Any, row: dict) -> None:
+        row = self._row(key, row)
+        super().__setitem__(key, row)
+        self.log_put(key, row)
+
+    def __delitem__(self, key: Any) -> None:
+        super().__delitem__(key)
+        self._engine.append(("del", self.name, key, None))
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        row = self[key]
+        del self[key]
+        return row
+
+    def update(self, *args, **kwargs) -> None:
+        for key, row in dict(*args, **kwargs).items():
+            self[key] = row
+
+    def clear(self) -> None:
+        for key in list(self):
+            del self[key]
+
+
+class StorageEngine:
+    def __init__(
+        self,
+        path: str,
+        commit_interval: float = 0.005,
+        compact_threshold: int = 64 * 1024 * 1024,
+    ) -> None:
+        self._directory = Path(path)
+        self._commit_interval = commit_interval
+        self._compact_threshold = compact_threshold
+        self._tables: dict[str, LoggedTable] = {}
+        self._pending: list[bytes] = []
+        # resolved once the pending records are on disk, and once the records being written are
+        self._group: asyncio.Future | None = None
+        self._group_in_flight: asyncio.Future | None = None
+        # one write at a time, and none in flight on a log being swapped
+        self._flush_lock = asyncio.Lock()
+        self._generation = 0
+        self._log_size = 0
+        self._log: Any = None
+        self._wakeup: asyncio.Event | None = None
+        self._commit_task: asyncio.Task | None = None
+        self._compact_task: asyncio.Task | None = None
+        self._closing = False
+
+    @property
+    def _snapshot_path(self) -> Path:
+        return self._directory / "snapshot.db"
+
+    def _log_path(self, generation: int) -> Path:
+        return self._directory / f"wal.{generation}.log"
+
+    # load snapshot + logs into LoggedTables
+    def open(self) -> dict[str, LoggedTable]:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._tables = {name: LoggedTable(name, self) for name in TABLES}
+        self._generation = self._load_snapshot()
+
+        generations = sorted(
+            int(log_path.name.split(".")[1]) for log_path in self._directory.glob("wal.*.log")
+        )
+        for generation in generations:
+            if generation >= self._generation:
+                self._replay(self._log_path(generation), self._tables)
+        # append to the newest log
+        self._generation = max([self._generation, *generations])
+
+        self._log = open(self._log_path(self._generation), "ab")
+        self._log_size = self._log.tell()
+        return self._tables
+
+    # plain rows, no second pass over them, see LoggedTable
+    # returns the first log generation to replay
+    def _load_snapshot(self) -> int:
+        if not self._snapshot_path.exists() or not self._snapshot_path.stat().st_size:
+            return 0
+
+        with open(self._snapshot_path, "rb") as file:
+            # unpickle straight from the page cache, no intermediate copy of the file
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                magic, generation = SNAPSHOT_HEADER.unpack_from(mapped)
+                if magic != SNAPSHOT_MAGIC:
+                    raise ValueError(f"{self._snapshot_path} is not a snapshot file")
+                mapped.seek(SNAPSHOT_HEADER.size)
+                snapshot: dict[str, dict] = pickle.load(mapped)
+
+        for name, rows in snapshot.items():
+            if (table := self._tables.get(name)) is not None:
+                table.load_all(rows)
+        return generation
+
+    # apply every complete record, a torn or corrupted tail (crash during a write) is cut off
+    @staticmethod
+    def _replay(log_path: Path, tables: dict[str, LoggedTable]) -> None:
+        if not (size := log_path.stat().st_size):
+            return
+
+        offset = 0
+        with open(log_path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    while offset + RECORD_HEADER.size <= size:
+                        length, crc = RECORD_HEADER.unpack_from(view, offset)
+                        start, end = offset + RECORD_HEADER.size, offset + RECORD_HEADER.size + length
+                        if end > size or zlib.crc32(view[start:end]) != crc:
+                            break
+                        op, name, key, row = pickle.loads(view[start:end])
+                        if (table := tables.get(name)) is not None:
+                            if op == "put":
+                                table.load(key, row)
+                            else:
+                                table.discard(key)
+                        offset = end
+
+        if offset != size:
+            os.truncate(log_path, offset)
+
+    def append(self, record: tuple) -> None:
+        self._pending.append(_frame(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)))
+        if self._wakeup:
+            self._wakeup.set()
+
+    # wait until every record appended so far is on disk
+    async def commit(self) -> None:
+        if self._pending and not (self._commit_task and not self._commit_task.done()):
+            # no commit loop (not started or closed), write them now
+            await self.flush()
+            return
+        if self._pending:
+            if not self._group:
+                self._group = asyncio.get_running_loop().create_future()
+            group = self._group
+        else:
+            # nothing appended, or being written
+            group = self._group_in_flight
+        if group:
+            # shielded, a cancelled writer does not fail the group of the others
+            await asyncio.shield(group)
+
+    def start(self) -> None:
+        if not self._commit_task:
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._commit_task = asyncio.create_task(self._run())
+            # records appended before the loop was running
+            if self._pending:
+                self._wakeup.set()
+
+    async def close(self) -> None:
+        # let the commit loop finish its current group instead of cancelling it mid write
+        if task := self._commit_task:
+            assert self._wakeup
+            self._closing = True
+            self._wakeup.set()
+            await task
+            self._commit_task = None
+        if task := self._compact_task:
+            await task
+            self._compact_task = None
+        self._wakeup = None
+        await self.flush()
+        if self._log:
+            self._log.close()
+            self._log = None
+
+    async def _run(self) -> None:
+        assert self._wakeup
+        while not self._closing:
+            await self._wakeup.wait()
+            # let more writes join the group before paying for the fsync
+            if not self._closing:
+                await asyncio.sleep(self._commit_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # the writers of the group got the error
+                print(f"Storage commit failed: {e!r}")
+                continue
+            compacting = self._compact_task and not self._compact_task.done()
+            if self._log_size >= self._compact_threshold and not compacting and not self._closing:
+                self._compact_task = asyncio.create_task(self.compact())
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            data, self._pending = b"".join(self._pending), []
+            group, self._group = self._group or asyncio.get_running_loop().create_future(), None
+            self._group_in_flight = group
+            self._log_size += len(data)
+            try:
+                await asyncio.to_thread(self._write, self._log, data)
+            except BaseException as e:
+                # not acknowledged, the records are written again with the next group
+                self._pending[:0] = [data]
+                self._log_size -= len(data)
+                group.set_exception(e)
+                raise
+            finally:
+                self._group_in_flight = None
+            group.set_result(None)
+
+    @staticmethod
+    def _write(file: Any, data: bytes) -> None:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+    # snapshot the tables and drop the logs it covers
+    async def compact(self) -> None:
+        # from here on, new records go to the next log generation, records still pending as well:
+        # their changes are in the tables copied below, replaying them again is idempotent
+        # only the tables are copied on the loop (references, no row is copied), the rows are
+        # serialized in a thread; a row changed meanwhile may be snapshotted in its newer state,
+        # the change is in the new log as well
+        async with self._flush_lock:
+            tables = {name: dict.copy(table) for name, table in self._tables.items()}
+            old_log, old_generation = self._log, self._generation
+            self._generation += 1
+            self._log = open(self._log_path(self._generation), "ab")
+            self._log_size = 0
+
+        await asyncio.to_thread(self._write_snapshot, tables, self._generation)
+        old_log.close()
+        for generation in range(old_generation + 1):
+            self._log_path(generation).unlink(missing_ok=True)
+
+    def _write_snapshot(self, tables: dict[str, dict], generation: int) -> None:
+        tmp_path = self._snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as file:
+            file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, generation))
+            pickle.dump(tables, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        # atomic swap, a crash leaves either the old or the new snapshot
+        os.replace(tmp_path, self._snapshot_path)
@@ -1,9 +1,23 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
 import aiomysql  # type: ignore
+from pymysql.constants import CLIENT  # type: ignore
+from pymysql.err import OperationalError  # type: ignore
+from app.domain.exceptions import DeadlineExceeded
+from app.infra import deadline
+from app.infra.persistence import statements
+from app.infra.tracing import tracer
+from app.infra.tracing.tracer import SPAN_KIND_CLIENT
 
 
 # explose
 __all__ = ('Database', )
 
+# ER_QUERY_TIMEOUT, maximum statement execution time exceeded
+# https://dev.mysql.com/doc/mysql-errors/8.0/en/server-error-reference.html#error_er_query_timeout
+ER_QUERY_TIMEOUT = 3024
+
 
 class Database:
 
@@ -20,6 +34,7 @@ class Database:
         pool_recycle=60,
         charset='utf-8',
         wait_timeout=30,
+        max_unbuffered=2,
     ):
         self._host = host
         self._user = user
@@ -32,6 +47,8 @@ class Database:
         self._pool_recycle = pool_recycle
         self._charset = charset
         self._wait_timeout = wait_timeout
+        # caps the connections opened next to the pool, so exports cannot exhaust max_connections
+        self._unbuffered_slots = asyncio.Semaphore(max_unbuffered)
         self.pool = None
 
     async def connect(self):
@@ -47,8 +64,93 @@ class Database:
             pool_recycle=self._pool_recycle,
             cursorclass=aiomysql.DictCursor,  # returns rows as dict
             init_command=f"SET wait_timeout={self._wait_timeout}",
+            # UPDATE reports matched rows instead of changed rows
+            client_flag=CLIENT.FOUND_ROWS,
         )
 
+    # get connection from pool, the wait for a free connection is traced on its own
+    # and bounded by what is left of the request deadline
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Any]:
+        assert self.pool
+        with tracer.span("pool.acquire", **{"db.pool.size": self.pool.size, "db.pool.free": self.pool.freesize}):
+            try:
+                conn = await asyncio.wait_for(self.pool.acquire(), timeout=deadline.check())
+            except TimeoutError:
+                raise DeadlineExceeded()
+        try:
+            yield conn
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # a statement may still be running on it, the pool drops closed connections
+            conn.close()
+            raise
+        finally:
+            await self.pool.release(conn)
+
+    # dedicated connection outside of the pool with a server side (unbuffered) cursor
+    # rows are streamed from the server instead of being loaded at once,
+    # and long reads do not hold a pooled connection away from other traffic
+    # at most max_unbuffered of them are open at once, callers wait for a free slot
+    # https://aiomysql.readthedocs.io/en/stable/cursors.html#SSCursor
+    @asynccontextmanager
+    async def unbuffered_cursor(self) -> AsyncIterator[Any]:
+        async with self._unbuffered_slots:
+            conn = await aiomysql.connect(
+                host=self._host,
+                user=self._user,
+                password=self._password,
+                db=self._dbname,
+                autocommit=self._autocommit,
+                port=self._port,
+                cursorclass=aiomysql.SSCursor,  # returns rows as tuple
+            )
+            try:
+                cur = await conn.cursor()
+                yield cur
+            finally:
+                # close the socket right away, closing the cursor would read all remaining rows
+                conn.close()
+
+    # run a statement on a cursor, traced as a client span
+    # within a request deadline, the server stops SELECTs when the budget is spent
+    # and the client gives up on any other statement
+    # https://dev.mysql.com/doc/refman/8.0/en/optimizer-hints.html#optimizer-hints-execution-time
+    @staticmethod
+    async def execute(cur: Any, query: str, args: tuple | None = None) -> int:
+        statement = query
+        if (timeout := deadline.check()) is not None and (slot := statements.hint_slot(query)):
+            statement = f"{slot[0]}{max(1, int(timeout * 1000))}{slot[1]}"
+        # the span keeps the statement without the hint, one value per statement
+        with tracer.span("db.execute", kind=SPAN_KIND_CLIENT, **{"db.system": "mysql", "db.statement": query}):
+            try:
+                return await asyncio.wait_for(cur.execute(query=statement, args=args), timeout=timeout)
+            except TimeoutError:
+                raise DeadlineExceeded()
+            except OperationalError as exc:
+                if exc.args[0] == ER_QUERY_TIMEOUT:
+                    raise DeadlineExceeded()
+                raise
+
+    # single statement on a pooled connection, saves the acquire / cursor boilerplate
+    async def fetch_one(self, query: str, args: tuple | None = None) -> dict | None:
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                await self.execute(cur, query=query, args=args)
+                return await cur.fetchone()
+
+    async def fetch_all(self, query: str, args: tuple | None = None) -> list[dict]:
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                await self.execute(cur, query=query, args=args)
+                return await cur.fetchall()
+
+    # returns the affected rows and the last inserted id
+    async def write(self, query: str, args: tuple | None = None) -> tuple[int, int]:
+        async with self.acquire() as conn:
+            async with conn.cursor() as cur:
+                affected = await self.execute(cur, query=query, args=args)
+                return affected, cur.lastrowid
+
     async def check_connection(self):
         async with self.pool.acquire() as conn:
             await conn.ping(reconnect=True)  # reconnect if no pong back
@@ -60,8 +162,20 @@ class Database:
         except Exception:
             raise
 
-    async def close(self):
-        if self.pool:
+    # stop handing out connections and wait for the used ones to be released,
+    # connections still in use after the timeout are terminated (their queries are cut off)
+    # returns the number of terminated connections
+    async def close(self, timeout: float | None = None) -> int:
+        if not self.pool:
+            return 0
+
+        terminated = 0
+        self.pool.close()
+        try:
+            await asyncio.wait_for(self.pool.wait_closed(), timeout=timeout)
+        except TimeoutError:
+            terminated = self.pool.size - self.pool.freesize
             self.pool.terminate()
             await self.pool.wait_closed()
-            self.pool = None
+        self.pool = None
+        return terminated
@@ -0,0 +1,58 @@
+import time
+
+# expose
+__all__ = ("SnowflakeIdGenerator", "shard_of", )
+
+# snowflake style 63-bit id, roughly time ordered so it can be used as a pagination cursor
+# https://en.wikipedia.org/wiki/Snowflake_ID
+# | 41 bits timestamp (ms) | 8 bits shard | 4 bits worker | 10 bits sequence |
+EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+SHARD_BITS = 8
+WORKER_BITS = 4
+SEQUENCE_BITS = 10
+
+MAX_SHARD = (1 << SHARD_BITS) - 1
+MAX_WORKER = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+WORKER_SHIFT = SEQUENCE_BITS
+SHARD_SHIFT = SEQUENCE_BITS + WORKER_BITS
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_BITS + SHARD_BITS
+
+
+# shard index encoded in a snowflake id
+# AUTO_INCREMENT ids from before sharding carry no shard, their bits decode to an arbitrary one
+# (e.g. 2**14 decodes to shard 1), they are routed by the repository, see legacy_max_id
+def shard_of(post_id: int) -> int:
+    return (post_id >> SHARD_SHIFT) & MAX_SHARD
+
+
+class SnowflakeIdGenerator:
+    def __init__(self, worker_id: int = 0) -> None:
+        # each app instance needs its own worker id, otherwise ids may collide
+        if not 0 <= worker_id <= MAX_WORKER:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER}")
+        self._worker_id = worker_id
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self, shard_id: int) -> int:
+        if not 0 <= shard_id <= MAX_SHARD:
+            raise ValueError(f"shard_id must be between 0 and {MAX_SHARD}")
+
+        now_ms = time.time_ns() // 1_000_000 - EPOCH_MS
+        if now_ms > self._last_ms:
+            self._last_ms, self._sequence = now_ms, 0
+        else:
+            # same ms or clock moved backwards, keep ids monotonic
+            # borrow the next ms instead of blocking the event loop when the sequence is exhausted
+            self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+            if self._sequence == 0:
+                self._last_ms += 1
+
+        return (
+            (self._last_ms << TIMESTAMP_SHIFT)
+            | (shard_id << SHARD_SHIFT)
+            | (self._worker_id << WORKER_SHIFT)
+            | self._sequence
+        )
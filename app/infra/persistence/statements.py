@@ -0,0 +1,109 @@
+import re
+from functools import lru_cache
+
+# expose
+__all__ = (
+    "FORMAT",
+    "QMARK",
+    "select",
+    "select_in",
+    "insert",
+    "update",
+    "delete",
+    "where",
+    "paginate",
+    "in_list_size",
+    "pad",
+    "hint_slot",
+)
+
+# SQL statements of the repositories, built once per shape and cached
+# - keyed by table, operation, columns and placeholder style, the values always go as args
+# - table and column names come from the code, never from the request
+# - batched shapes (IN list) come from the same templates
+
+# placeholder styles of the DB-API drivers
+# https://peps.python.org/pep-0249/#paramstyle
+FORMAT = "%s"  # aiomysql, pymysql
+QMARK = "?"  # sqlite3, aiosqlite
+
+CACHE_SIZE = 512
+
+SELECT_REGEX = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+WHERE_REGEX = re.compile(r"\bWHERE\b", re.IGNORECASE)
+
+
+def _placeholders(count: int, placeholder: str) -> str:
+    return ", ".join([placeholder] * count)
+
+
+def _conditions(columns: tuple[str, ...], placeholder: str) -> str:
+    return " AND ".join(f"{column} = {placeholder}" for column in columns)
+
+
+# "<query> WHERE a = %s AND b = %s"
+@lru_cache(maxsize=CACHE_SIZE)
+def where(query: str, columns: tuple[str, ...], placeholder: str = FORMAT) -> str:
+    return f"{query} WHERE {_conditions(columns, placeholder)}" if columns else query
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def select(table: str, columns: tuple[str, ...], by: tuple[str, ...] = (), placeholder: str = FORMAT) -> str:
+    return where(f"SELECT {', '.join(columns)} FROM {table}", by, placeholder)
+
+
+# size is the number of values in the list, see in_list_size
+@lru_cache(maxsize=CACHE_SIZE)
+def select_in(table: str, columns: tuple[str, ...], column: str, size: int, placeholder: str = FORMAT) -> str:
+    return f"SELECT {', '.join(columns)} FROM {table} WHERE {column} IN ({_placeholders(size, placeholder)})"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def insert(table: str, columns: tuple[str, ...], placeholder: str = FORMAT) -> str:
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({_placeholders(len(columns), placeholder)})"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def update(table: str, columns: tuple[str, ...], by: tuple[str, ...], placeholder: str = FORMAT) -> str:
+    assignments = ", ".join(f"{column} = {placeholder}" for column in columns)
+    return where(f"UPDATE {table} SET {assignments}", by, placeholder)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def delete(table: str, by: tuple[str, ...], placeholder: str = FORMAT) -> str:
+    return where(f"DELETE FROM {table}", by, placeholder)
+
+
+# keyset pagination on the given column, args are (after, limit) without the unset ones,
+# following the args of the query's own conditions
+# the cursor is ANDed to a WHERE of the query, as built by where()
+@lru_cache(maxsize=CACHE_SIZE)
+def paginate(query: str, column: str, after: bool, limit: bool, placeholder: str = FORMAT) -> str:
+    if after:
+        keyword = "AND" if WHERE_REGEX.search(query) else "WHERE"
+        query = f"{query} {keyword} {column} > {placeholder}"
+    query = f"{query} ORDER BY {column}"
+    if limit:
+        query = f"{query} LIMIT {placeholder}"
+    return query
+
+
+# IN lists grow in powers of two, a handful of statements cover every list length
+# (and the server sees the same few statement digests)
+def in_list_size(count: int) -> int:
+    return 1 << (count - 1).bit_length() if count > 1 else 1
+
+
+# fill up to size by repeating the last value, duplicates do not change an IN list
+def pad(values: tuple, size: int) -> tuple:
+    return values + values[-1:] * (size - len(values))
+
+
+# SELECT split around a MAX_EXECUTION_TIME hint, only the milliseconds are filled in per call
+# None for other statements, the hint only applies to SELECT
+# https://dev.mysql.com/doc/refman/8.0/en/optimizer-hints.html#optimizer-hints-execution-time
+@lru_cache(maxsize=CACHE_SIZE)
+def hint_slot(query: str) -> tuple[str, str] | None:
+    if not (match := SELECT_REGEX.match(query)):
+        return None
+    return f"{match.group()} /*+ MAX_EXECUTION_TIME(", f") */{query[match.end():]}"
@@ -0,0 +1 @@
+from app.infra.rate_limit.token_bucket import RateLimit, Decision, TokenBucketStore
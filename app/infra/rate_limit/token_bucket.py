@@ -0,0 +1,107 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+# expose
+__all__ = ("RateLimit", "Decision", "TokenBucketStore", )
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimit:
+    rate: float  # tokens refilled per second
+    burst: int  # bucket capacity
+
+
+@dataclass(frozen=True, slots=True)
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: int  # seconds until the bucket is full again
+    retry_after: int  # seconds until the request would be allowed, 0 if allowed
+
+
+# token buckets kept in N small ordered dicts instead of one big dict
+# - a bucket is only [tokens, last_seen], refilled lazily when it is hit, no timers
+# - every hit moves the key to the end, so each shard is ordered from least to most recently used
+#   and idle buckets are always at the front: eviction stops at the first active bucket
+# - each shard holds at most max_keys_per_shard buckets, the least recently used one goes first
+# OrderedDict keeps move_to_end / popitem(last=False) O(1)
+# https://en.wikipedia.org/wiki/Token_bucket
+class TokenBucketStore:
+    def __init__(
+        self,
+        shards: int = 64,
+        max_keys_per_shard: int = 16384,
+        idle_ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._shards: list[OrderedDict[str, list[float]]] = [OrderedDict() for _ in range(shards)]
+        self._max_keys_per_shard = max_keys_per_shard
+        self._idle_ttl = idle_ttl
+        self._clock = clock
+        self._eviction_task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def take(self, key: str, limit: RateLimit, cost: float = 1.0) -> Decision:
+        shard = self._shards[hash(key) % len(self._shards)]
+        now = self._clock()
+
+        if (bucket := shard.get(key)) is None:
+            if len(shard) >= self._max_keys_per_shard:
+                # drop the least recently used bucket
+                shard.popitem(last=False)
+            bucket = shard[key] = [float(limit.burst), now]
+        else:
+            shard.move_to_end(key)
+            # lazy refill since the last hit
+            bucket[0] = min(float(limit.burst), bucket[0] + (now - bucket[1]) * limit.rate)
+            bucket[1] = now
+
+        if allowed := bucket[0] >= cost:
+            bucket[0] -= cost
+        tokens = bucket[0]
+
+        return Decision(
+            allowed=allowed,
+            limit=limit.burst,
+            remaining=int(tokens),
+            reset_after=math.ceil((limit.burst - tokens) / limit.rate),
+            retry_after=0 if allowed else math.ceil((cost - tokens) / limit.rate),
+        )
+
+    # drop buckets not hit within idle_ttl, a refilled bucket is the same as a new one
+    def evict_idle(self) -> int:
+        deadline = self._clock() - self._idle_ttl
+        evicted = 0
+        for shard in self._shards:
+            while shard:
+                key = next(iter(shard))
+                if shard[key][1] >= deadline:
+                    break
+                del shard[key]
+                evicted += 1
+        return evicted
+
+    async def _run_eviction(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+    def start_eviction(self, interval: float) -> None:
+        if not self._eviction_task:
+            self._eviction_task = asyncio.create_task(self._run_eviction(interval))
+
+    async def stop_eviction(self) -> None:
+        if task := self._eviction_task:
+            self._eviction_task = None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
@@ -1,9 +1,18 @@
 from app.infra.repositories.user.MemoryUserRepository import (
     MemoryUserRepository,
 )
+from app.infra.repositories.user.MySQLUserRepository import (
+    MySQLUserRepository,
+)
 from app.infra.repositories.post.MemoryPostRepository import (
     MeoryPostRepository,
 )
 from app.infra.repositories.post.MySQLPostRepository import (
     MySQLPostRepository,
 )
+from app.infra.repositories.post.ShardedMySQLPostRepository import (
+    ShardedMySQLPostRepository,
+)
+from app.infra.repositories.post.PublishingPostRepository import (
+    PublishingPostRepository,
+)
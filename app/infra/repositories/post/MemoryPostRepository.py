@@ -1,7 +1,14 @@
+from datetime import datetime, UTC
+from collections import Counter
+from itertools import islice
+from typing import AsyncIterator
 from app.infra.persistence.mem_db.fake_database import FakeDatabase
 from app.domain.repositories import PostRepository
+from app.domain.repositories.post import EXPORT_COLUMNS
 from app.domain.models.post import Post
 from app.domain.models.user import User
+from app.domain.exceptions import PostNotFound, Forbiden, PostConflict
+from app.infra.tracing import traced
 
 
 # subclassing PostRepository
@@ -9,15 +16,18 @@ class MeoryPostRepository(PostRepository):
     def __init__(self, database: FakeDatabase) -> None:
         self.database = database
 
+    @traced()
     async def create(self, post: Post) -> Post:
         # serialize (from domain model to dict)
         post_data = self._serialize(post)
         # persist
         self.database.posts[post_data["post_id"]] = post_data
+        await self.database.commit()
         # update id and return
         post.post_id = post_data["post_id"]
         return post
 
+    @traced()
     async def get_by_id(self, post_id: int) -> Post | None:
         if not (post_data := self.database.posts.get(post_id)):
             return None
@@ -25,10 +35,62 @@ class MeoryPostRepository(PostRepository):
         # deserialize (from dict to domain model) and return
         return self._build_post_model(post_data)
 
-    async def get_posts(self) -> list[Post]:
+    @traced()
+    async def get_by_id_with_user(self, post_id: int) -> Post | None:
+        if not (post_data := self.database.posts.get(post_id)):
+            return None
+        # posts and users live in the same store, join in place
+        if not (user_data := self.database.users.get(post_data["user_id"])):
+            return None
+        return self._build_post_model(post_data, user_data)
+
+    @traced()
+    async def get_posts(self, after: int | None = None, limit: int | None = None) -> list[Post]:
+        post_ids = sorted(
+            post_id for post_id in self.database.posts
+            if after is None or post_id > after
+        )[:limit]
         # iter + deserialize (from dict to domain model) and return
-        return [self._build_post_model(post_data) for post_data in self.database.posts.values()]
+        return [self._build_post_model(self.database.posts[post_id]) for post_id in post_ids]
+
+    @traced()
+    async def get_posts_with_user(self, after: int | None = None, limit: int | None = None) -> list[Post]:
+        post_ids = sorted(
+            post_id for post_id in self.database.posts
+            if after is None or post_id > after
+        )[:limit]
+        posts = []
+        for post_id in post_ids:
+            post_data = self.database.posts[post_id]
+            # posts without author are left out, like an inner join
+            if user_data := self.database.users.get(post_data["user_id"]):
+                posts.append(self._build_post_model(post_data, user_data))
+        return posts
 
+    @traced()
+    async def get_fields_by_id(self, post_id: int, fields: frozenset[str]) -> dict | None:
+        if not (post_data := self.database.posts.get(post_id)):
+            return None
+        return self._build_projection(post_data, fields)
+
+    @traced()
+    async def get_posts_fields(
+        self,
+        fields: frozenset[str],
+        after: int | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        post_ids = sorted(
+            post_id for post_id in self.database.posts
+            if after is None or post_id > after
+        )[:limit]
+        posts = []
+        for post_id in post_ids:
+            if (post := self._build_projection(self.database.posts[post_id], fields)) is not None:
+                posts.append(post)
+        return posts
+
+    @traced()
     async def update(self, post: Post) -> Post:
         # return if nothing to update
         if not post.modified_fields:
@@ -36,13 +98,50 @@ class MeoryPostRepository(PostRepository):
         # otherwise partial update
         self.database.posts[post.post_id].update(
             self._serialize(post, partial=True))
+        await self.database.commit()
         return post
 
-    async def delete(self, post_id: int) -> None:
+    @traced()
+    async def update_title_if_owner(
+        self,
+        post_id: int,
+        user_id: int,
+        title: str,
+        expected_updated: datetime | None = None,
+    ) -> Post:
+        # check and write without awaiting in between, atomic for the event loop
+        if not (post_data := self.database.posts.get(post_id)):
+            raise PostNotFound(post_id=post_id)
+        if post_data["user_id"] != user_id:
+            raise Forbiden()
+        if expected_updated is not None and post_data["updated"] != expected_updated:
+            raise PostConflict(post_id=post_id)
+
+        post_data.update({"title": title, "updated": datetime.now(UTC)})
+        await self.database.commit()
+        return self._build_post_model(post_data, self.database.users.get(user_id))
+
+    @traced()
+    async def delete(self, post_id: int) -> Post | None:
         try:
-            self.database.posts.pop(post_id)
+            post_data = self.database.posts.pop(post_id)
         except KeyError:
             return None
+        await self.database.commit()
+        return self._build_post_model(post_data)
+
+    @traced()
+    async def count_by_user(self) -> dict[int, int]:
+        return dict(Counter(post_data["user_id"] for post_data in self.database.posts.values()))
+
+    async def export_rows(self, batch_size: int) -> AsyncIterator[list[tuple]]:
+        # snapshot the table so writes during the export do not break the iteration
+        rows = (
+            tuple(post_data[column] for column in EXPORT_COLUMNS)
+            for post_data in list(self.database.posts.values())
+        )
+        while batch := list(islice(rows, batch_size)):
+            yield batch
 
     def _serialize(self, post: Post, partial: bool = False) -> dict:
         # https://mypy.readthedocs.io/en/latest/error_code_list.html#code-union-attr
@@ -68,15 +167,28 @@ class MeoryPostRepository(PostRepository):
             return data
 
     def _generate_id(self) -> int:
-        return len(self.database.posts) + 1
+        return self.database.next_id("posts")
+
+    # None when the author is requested but missing, like an inner join
+    def _build_projection(self, post_data: dict, fields: frozenset[str]) -> dict | None:
+        post = {field: post_data[field] for field in ("post_id", "title", "created", "updated") if field in fields}
+        if "user" in fields:
+            if not (user_data := self.database.users.get(post_data["user_id"])):
+                return None
+            post["user"] = {
+                "user_id": user_data["user_id"],
+                "email": user_data["email"],
+                "created": user_data["created"],
+            }
+        return post
 
-    def _build_post_model(self, post_data: dict) -> Post:
+    def _build_post_model(self, post_data: dict, user_data: dict | None = None) -> Post:
         return Post(
             post_id=post_data["post_id"],
             title=post_data["title"],
             created=post_data["created"],
             updated=post_data["updated"],
-            user=User(
+            user=User(**user_data) if user_data else User(
                 user_id=post_data["user_id"],
             )
         )
@@ -1,81 +1,207 @@
+from datetime import datetime, UTC
+from functools import lru_cache
+from typing import AsyncIterator
+from app.infra.persistence import statements
 from app.infra.persistence.mysql.database import Database
 from app.domain.repositories import PostRepository
+from app.domain.repositories.post import EXPORT_COLUMNS
 from app.domain.models.post import Post
 from app.domain.models.user import User
+from app.domain.exceptions import PostNotFound, Forbiden, PostConflict
+from app.infra.tracing import traced
+
+POST_COLUMNS = ("post_id", "title", "created", "updated", "user_id")
+SELECT_POST_QUERY = statements.select("posts", POST_COLUMNS, by=("post_id",))
+
+# post and author in a single round trip
+POST_WITH_USER_QUERY = (
+    "SELECT p.post_id, p.title, p.created, p.updated, p.user_id, "
+    "u.email AS user_email, u.created AS user_created, u.updated AS user_updated "
+    "FROM posts p JOIN users u ON u.user_id = p.user_id"
+)
+SELECT_POST_WITH_USER_QUERY = statements.where(POST_WITH_USER_QUERY, ("p.post_id",))
+
+# served by the user_id index
+COUNT_BY_USER_QUERY = "SELECT user_id, COUNT(*) AS post_count FROM posts GROUP BY user_id"
+
+# column per projected field, "user" comes from the users table
+FIELD_COLUMNS = {
+    "post_id": "p.post_id",
+    "title": "p.title",
+    "created": "p.created",
+    "updated": "p.updated",
+}
+
+
+# SELECT of the requested columns only, joined with users only for "user"
+# one statement per field set, cached like the other statements
+@lru_cache(maxsize=statements.CACHE_SIZE)
+def _projection(fields: frozenset[str], join_users: bool) -> str:
+    columns = [column for field, column in FIELD_COLUMNS.items() if field in fields]
+    if "user" not in fields:
+        return f"SELECT {', '.join(columns)} FROM posts p"
+
+    columns.append("p.user_id")
+    if not join_users:
+        return f"SELECT {', '.join(columns)} FROM posts p"
+
+    columns += ["u.email AS user_email", "u.created AS user_created"]
+    return f"SELECT {', '.join(columns)} FROM posts p JOIN users u ON u.user_id = p.user_id"
 
 
 # subclassing PostRepository
 class MySQLPostRepository(PostRepository):
-    def __init__(self, database: Database) -> None:
-        self.connection_pool = database.pool  # get pool from database
+    # without join_users, projections only carry the author's user_id
+    # (users live in another database when posts are sharded)
+    def __init__(self, database: Database, join_users: bool = True) -> None:
+        self.database = database
+        self.join_users = join_users
 
+    @traced()
     async def create(self, post: Post) -> Post:
-        assert self.connection_pool
-        async with self.connection_pool.acquire() as conn:  # get connection from pool
-            async with conn.cursor() as cur:
-                await cur.execute(
-                    query="INSERT INTO posts (post_id, title, created, updated, user_id) VALUES (%s, %s, %s, %s, %s)",
-                    args=(
-                        post.post_id,
-                        post.title,
-                        post.created,
-                        post.updated,
-                        post.user.user_id,
-                    ),
-                )
-                post.post_id = cur.lastrowid
+        _, post.post_id = await self.database.write(
+            query=statements.insert("posts", POST_COLUMNS),
+            args=tuple(self._serialize(post).values()),
+        )
         return post
 
+    @traced()
     async def get_by_id(self, post_id: int) -> Post | None:
-        assert self.connection_pool
-        async with self.connection_pool.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(
-                    query="SELECT post_id, title, created, updated, user_id FROM posts WHERE post_id = %s",
-                    args=(post_id,),
-                )
-                post_data = await cur.fetchone()
+        post_data = await self.database.fetch_one(query=SELECT_POST_QUERY, args=(post_id,))
 
         # deserialize (from dict to domain model) and return
         return self._build_post_model(post_data) if post_data else None
 
-    async def get_posts(self) -> list[Post]:
-        assert self.connection_pool
-        async with self.connection_pool.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(
-                    query="SELECT post_id, title, created, updated, user_id FROM posts"
-                )
-                posts = await cur.fetchall()
+    @traced()
+    async def get_by_id_with_user(self, post_id: int) -> Post | None:
+        post_data = await self.database.fetch_one(query=SELECT_POST_WITH_USER_QUERY, args=(post_id,))
+
+        return self._build_post_model(post_data) if post_data else None
+
+    @traced()
+    async def get_posts(self, after: int | None = None, limit: int | None = None) -> list[Post]:
+        query, args = self._paginate(
+            statements.select("posts", POST_COLUMNS),
+            column="post_id",
+            after=after,
+            limit=limit,
+        )
+        posts = await self.database.fetch_all(query=query, args=args)
 
         # iter + deserialize (from dict to domain model) and return
         return [self._build_post_model(post_data) for post_data in posts]
 
+    @traced()
+    async def get_posts_with_user(self, after: int | None = None, limit: int | None = None) -> list[Post]:
+        query, args = self._paginate(POST_WITH_USER_QUERY, column="p.post_id", after=after, limit=limit)
+        posts = await self.database.fetch_all(query=query, args=args)
+
+        return [self._build_post_model(post_data) for post_data in posts]
+
+    @traced()
+    async def get_fields_by_id(self, post_id: int, fields: frozenset[str]) -> dict | None:
+        post_data = await self.database.fetch_one(
+            query=statements.where(_projection(fields, self.join_users), ("p.post_id",)),
+            args=(post_id,),
+        )
+
+        return self._build_projection(post_data) if post_data else None
+
+    @traced()
+    async def get_posts_fields(
+        self,
+        fields: frozenset[str],
+        after: int | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        query, args = self._paginate(
+            _projection(fields, self.join_users),
+            column="p.post_id",
+            after=after,
+            limit=limit,
+        )
+        posts = await self.database.fetch_all(query=query, args=args)
+
+        return [self._build_projection(post_data) for post_data in posts]
+
+    @traced()
     async def update(self, post: Post) -> Post:
         # return a empty dict if no fields are updated
         if not (modified_data := self._serialize(post=post, partial=True)):
             return post
 
-        assert self.connection_pool
-        async with self.connection_pool.acquire() as conn:
+        await self.database.write(
+            query=statements.update("posts", tuple(modified_data), by=("post_id",)),
+            args=tuple(modified_data.values()) + (post.post_id,),
+        )
+
+        return post
+
+    @traced()
+    async def update_title_if_owner(
+        self,
+        post_id: int,
+        user_id: int,
+        title: str,
+        expected_updated: datetime | None = None,
+    ) -> Post:
+        by: tuple[str, ...] = ("post_id", "user_id")
+        args: tuple = (title, datetime.now(UTC), post_id, user_id)
+        if expected_updated is not None:
+            by, args = by + ("updated",), args + (expected_updated,)
+        select_query = SELECT_POST_WITH_USER_QUERY if self.join_users else SELECT_POST_QUERY
+
+        async with self.database.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(
-                    query=f"UPDATE posts SET {', '.join([f'`{key}` = %s' for key in modified_data.keys(
-                    )])} WHERE post_id = %s",
-                    args=tuple(modified_data.values()) + (post.post_id,),
+                # guarded write first, rows matched (not changed), the pool connects with CLIENT.FOUND_ROWS
+                matched = await self.database.execute(
+                    cur,
+                    query=statements.update("posts", ("title", "updated"), by=by),
+                    args=args,
                 )
+                # read back the post with its author, or find out why nothing matched
+                await self.database.execute(cur, query=select_query, args=(post_id,))
+                post_data = await cur.fetchone()
 
-        return post
+        if not post_data:
+            raise PostNotFound(post_id=post_id)
+        if not matched:
+            if post_data["user_id"] != user_id:
+                raise Forbiden()
+            # owned, so expected_updated no longer matches
+            raise PostConflict(post_id=post_id)
+        return self._build_post_model(post_data)
 
-    async def delete(self, post_id: int) -> None:
-        assert self.connection_pool
-        async with self.connection_pool.acquire() as conn:
+    @traced()
+    async def delete(self, post_id: int) -> Post | None:
+        async with self.database.acquire() as conn:
             async with conn.cursor() as cur:
-                await cur.execute(
-                    query="DELETE FROM posts WHERE post_id = %s",
+                # MySQL has no DELETE ... RETURNING, read the row first
+                await self.database.execute(cur, query=SELECT_POST_QUERY, args=(post_id,))
+                if not (post_data := await cur.fetchone()):
+                    return None
+
+                deleted = await self.database.execute(
+                    cur,
+                    query=statements.delete("posts", by=("post_id",)),
                     args=(post_id,),
                 )
-            return None
+
+        return self._build_post_model(post_data) if deleted else None
+
+    @traced()
+    async def count_by_user(self) -> dict[int, int]:
+        counts = await self.database.fetch_all(query=COUNT_BY_USER_QUERY)
+        return {row["user_id"]: row["post_count"] for row in counts}
+
+    async def export_rows(self, batch_size: int) -> AsyncIterator[list[tuple]]:
+        async with self.database.unbuffered_cursor() as cur:
+            await self.database.execute(
+                cur,
+                query=statements.select("posts", EXPORT_COLUMNS),
+            )
+            while rows := await cur.fetchmany(batch_size):
+                yield rows
 
     @staticmethod
     def _serialize(post: Post, partial: bool = False) -> dict:
@@ -101,13 +227,42 @@ class MySQLPostRepository(PostRepository):
 
             return data
 
+    @staticmethod
+    def _build_projection(post_data: dict) -> dict:
+        if "user_id" in post_data:
+            user = {"user_id": post_data.pop("user_id")}
+            if "user_email" in post_data:
+                user["email"] = post_data.pop("user_email")
+                user["created"] = post_data.pop("user_created")
+            post_data["user"] = user
+        return post_data
+
+    # keyset pagination on the given column
+    @staticmethod
+    def _paginate(query: str, column: str, after: int | None, limit: int | None) -> tuple[str, tuple]:
+        return (
+            statements.paginate(query, column, after=after is not None, limit=limit is not None),
+            tuple(arg for arg in (after, limit) if arg is not None),
+        )
+
     def _build_post_model(self, post_data: dict) -> Post:
+        # rows from POST_WITH_USER_QUERY carry the author columns
+        if "user_email" in post_data:
+            user = User(
+                user_id=post_data["user_id"],
+                email=post_data["user_email"],
+                created=post_data["user_created"],
+                updated=post_data["user_updated"],
+            )
+        else:
+            user = User(
+                user_id=post_data["user_id"],
+            )
+
         return Post(
             post_id=post_data["post_id"],
             title=post_data["title"],
             created=post_data["created"],
             updated=post_data["updated"],
-            user=User(
-                user_id=post_data["user_id"],
-            )
+            user=user,
         )
@@ -0,0 +1,92 @@
+from datetime import datetime
+from typing import AsyncIterator
+from app.infra.events import BroadcastHub
+from app.domain.repositories import PostRepository
+from app.domain.models.post import Post
+
+
+# decorates any PostRepository, successful writes are published to the change hub
+class PublishingPostRepository(PostRepository):
+    def __init__(self, post_repository: PostRepository, hub: BroadcastHub) -> None:
+        self.post_repository = post_repository
+        self.hub = hub
+
+    async def create(self, post: Post) -> Post:
+        post = await self.post_repository.create(post)
+        self.hub.publish("created", self._to_event_data(post))
+        return post
+
+    async def get_by_id(self, post_id: int) -> Post | None:
+        return await self.post_repository.get_by_id(post_id)
+
+    async def get_by_id_with_user(self, post_id: int) -> Post | None:
+        return await self.post_repository.get_by_id_with_user(post_id)
+
+    async def get_posts(self, after: int | None = None, limit: int | None = None) -> list[Post]:
+        return await self.post_repository.get_posts(after=after, limit=limit)
+
+    async def get_posts_with_user(self, after: int | None = None, limit: int | None = None) -> list[Post]:
+        return await self.post_repository.get_posts_with_user(after=after, limit=limit)
+
+    async def get_fields_by_id(self, post_id: int, fields: frozenset[str]) -> dict | None:
+        return await self.post_repository.get_fields_by_id(post_id, fields)
+
+    async def get_posts_fields(
+        self,
+        fields: frozenset[str],
+        after: int | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        return await self.post_repository.get_posts_fields(fields, after=after, limit=limit)
+
+    async def update(self, post: Post) -> Post:
+        # fields tracked by the domain model events
+        if not (changes := list(post.modified_fields)):
+            return await self.post_repository.update(post)
+        # ownership changes carry the previous owner
+        previous_user = post.modified_fields.get("user", {}).get("original_value")
+        post = await self.post_repository.update(post)
+        data = self._to_event_data(post, changes=changes)
+        if previous_user:
+            data["previous_user_id"] = previous_user.user_id
+        self.hub.publish("updated", data)
+        return post
+
+    async def update_title_if_owner(
+        self,
+        post_id: int,
+        user_id: int,
+        title: str,
+        expected_updated: datetime | None = None,
+    ) -> Post:
+        post = await self.post_repository.update_title_if_owner(
+            post_id=post_id,
+            user_id=user_id,
+            title=title,
+            expected_updated=expected_updated,
+        )
+        self.hub.publish("updated", self._to_event_data(post, changes=["title"]))
+        return post
+
+    async def delete(self, post_id: int) -> Post | None:
+        if post := await self.post_repository.delete(post_id):
+            self.hub.publish("deleted", self._to_event_data(post))
+        return post
+
+    async def count_by_user(self) -> dict[int, int]:
+        return await self.post_repository.count_by_user()
+
+    def export_rows(self, batch_size: int) -> AsyncIterator[list[tuple]]:
+        return self.post_repository.export_rows(batch_size)
+
+    @staticmethod
+    def _to_event_data(post: Post, changes: list[str] | None = None) -> dict:
+        data = {
+            "post_id": post.post_id,
+            "title": post.title,
+            "updated": post.updated,
+            "user_id": post.user.user_id if post.user else None,
+        }
+        if changes is not None:
+            data["changes"] = changes
+        return data
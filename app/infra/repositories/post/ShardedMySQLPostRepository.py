@@ -0,0 +1,187 @@
+import asyncio
+import heapq
+from datetime import datetime
+from collections import Counter
+from itertools import islice
+from operator import itemgetter
+from typing import AsyncIterator
+from app.infra.persistence.mysql.database import Database
+from app.infra.persistence.mysql.snowflake import SnowflakeIdGenerator, shard_of
+from app.infra.repositories.post.MySQLPostRepository import MySQLPostRepository
+from app.domain.repositories import PostRepository, UserRepository
+from app.domain.models.post import Post
+from app.domain.exceptions import PostNotFound, UserNotFound
+from app.infra.tracing import traced
+
+
+# subclassing PostRepository
+# posts are spread over N databases, the shard index is encoded in the post id
+# users are not sharded, so authors are loaded with one batch lookup instead of a join
+# posts from before sharding keep their AUTO_INCREMENT ids up to legacy_max_id and stay in the
+# existing table, which has to be the first shard; snowflake ids are far above any such id
+class ShardedMySQLPostRepository(PostRepository):
+    def __init__(
+        self,
+        databases: list[Database],
+        id_generator: SnowflakeIdGenerator,
+        user_repository: UserRepository,
+        legacy_max_id: int = 0,
+    ) -> None:
+        # one plain repository per shard, the sharded one only routes
+        self.shards = [MySQLPostRepository(database=database, join_users=False) for database in databases]
+        self.id_generator = id_generator
+        self.user_repository = user_repository
+        self.legacy_max_id = legacy_max_id
+
+    @traced()
+    async def create(self, post: Post) -> Post:
+        # https://mypy.readthedocs.io/en/latest/error_code_list.html#code-union-attr
+        assert post.user
+        # keep posts of the same user together
+        shard_id = post.user.user_id % len(self.shards)
+        post_id = self.id_generator.next_id(shard_id)
+        post.post_id = post_id
+        post = await self.shards[shard_id].create(post)
+        post.post_id = post_id
+        return post
+
+    @traced()
+    async def get_by_id(self, post_id: int) -> Post | None:
+        if not (shard := self._route(post_id)):
+            return None
+        return await shard.get_by_id(post_id)
+
+    @traced()
+    async def get_by_id_with_user(self, post_id: int) -> Post | None:
+        if not (post := await self.get_by_id(post_id)):
+            return None
+        # https://mypy.readthedocs.io/en/latest/error_code_list.html#code-union-attr
+        assert post.user
+        if not (user := await self.user_repository.get_by_id(post.user.user_id)):
+            return None
+        post.user = user
+        return post
+
+    # scatter-gather, each shard returns a page ordered by post_id
+    # and pages are k-way merged on the cursor
+    @traced()
+    async def get_posts(self, after: int | None = None, limit: int | None = None) -> list[Post]:
+        pages = await asyncio.gather(
+            *(shard.get_posts(after=after, limit=limit) for shard in self.shards)
+        )
+        merged = heapq.merge(*pages, key=lambda post: post.post_id)
+        return list(islice(merged, limit))
+
+    @traced()
+    async def get_posts_with_user(self, after: int | None = None, limit: int | None = None) -> list[Post]:
+        posts = await self.get_posts(after=after, limit=limit)
+        users = await self.user_repository.get_by_ids(
+            post.user.user_id for post in posts if post.user
+        )
+        # posts without author are left out, like an inner join
+        posts = [post for post in posts if post.user and post.user.user_id in users]
+        for post in posts:
+            assert post.user
+            post.user = users[post.user.user_id]
+        return posts
+
+    @traced()
+    async def get_fields_by_id(self, post_id: int, fields: frozenset[str]) -> dict | None:
+        if not (shard := self._route(post_id)):
+            return None
+        if not (post := await shard.get_fields_by_id(post_id, fields)):
+            return None
+        posts = await self._load_authors([post], fields)
+        return posts[0] if posts else None
+
+    @traced()
+    async def get_posts_fields(
+        self,
+        fields: frozenset[str],
+        after: int | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        # post_id is needed to merge the pages
+        shard_fields = fields | {"post_id"}
+        pages = await asyncio.gather(
+            *(shard.get_posts_fields(shard_fields, after=after, limit=limit) for shard in self.shards)
+        )
+        posts = list(islice(heapq.merge(*pages, key=itemgetter("post_id")), limit))
+        if "post_id" not in fields:
+            for post in posts:
+                del post["post_id"]
+        return await self._load_authors(posts, fields)
+
+    @traced()
+    async def update(self, post: Post) -> Post:
+        assert post.post_id
+        if not (shard := self._route(post.post_id)):
+            return post
+        return await shard.update(post)
+
+    @traced()
+    async def update_title_if_owner(
+        self,
+        post_id: int,
+        user_id: int,
+        title: str,
+        expected_updated: datetime | None = None,
+    ) -> Post:
+        if not (shard := self._route(post_id)):
+            raise PostNotFound(post_id=post_id)
+        # users live in another database, the author is loaded while the shard writes
+        # the post is checked first: not found, forbidden and conflict come from the shard
+        user_task = asyncio.create_task(self.user_repository.get_by_id(user_id))
+        try:
+            post = await shard.update_title_if_owner(
+                post_id=post_id,
+                user_id=user_id,
+                title=title,
+                expected_updated=expected_updated,
+            )
+        except BaseException:
+            user_task.cancel()
+            raise
+        # the caller owns the post but has no user row (written already, the databases disagree)
+        if not (user := await user_task):
+            raise UserNotFound(user_id=user_id)
+        post.user = user
+        return post
+
+    @traced()
+    async def delete(self, post_id: int) -> Post | None:
+        if not (shard := self._route(post_id)):
+            return None
+        return await shard.delete(post_id)
+
+    @traced()
+    async def count_by_user(self) -> dict[int, int]:
+        counts: Counter[int] = Counter()
+        for shard_counts in await asyncio.gather(*(shard.count_by_user() for shard in self.shards)):
+            counts.update(shard_counts)
+        return dict(counts)
+
+    # shards are exported one after another, an export has no ordering guarantee
+    async def export_rows(self, batch_size: int) -> AsyncIterator[list[tuple]]:
+        for shard in self.shards:
+            async for rows in shard.export_rows(batch_size):
+                yield rows
+
+    # shards only return the author's user_id, posts without author are left out
+    async def _load_authors(self, posts: list[dict], fields: frozenset[str]) -> list[dict]:
+        if "user" not in fields:
+            return posts
+        users = await self.user_repository.get_by_ids(post["user"]["user_id"] for post in posts)
+        posts = [post for post in posts if post["user"]["user_id"] in users]
+        for post in posts:
+            user = users[post["user"]["user_id"]]
+            post["user"] = {"user_id": user.user_id, "email": user.email, "created": user.created}
+        return posts
+
+    def _route(self, post_id: int) -> MySQLPostRepository | None:
+        if post_id <= self.legacy_max_id:
+            return self.shards[0]
+        # an id pointing to an unknown shard cannot exist
+        if (shard_id := shard_of(post_id)) >= len(self.shards):
+            return None
+        return self.shards[shard_id]
@@ -1,6 +1,8 @@
+from typing import Iterable
 from app.infra.persistence.mem_db.fake_database import FakeDatabase
 from app.domain.repositories import UserRepository
 from app.domain.models.user import User
+from app.infra.tracing import traced
 
 
 # subclassing UserRepository
@@ -8,6 +10,7 @@ class MemoryUserRepository(UserRepository):
     def __init__(self, database: FakeDatabase):
         self.database = database
 
+    @traced()
     async def get_by_id(self, user_id: int) -> User | None:
         # get user from db
         if not (user_data := self.database.users.get(user_id)):
@@ -16,5 +19,13 @@ class MemoryUserRepository(UserRepository):
         # deserialize user (to domain model)
         return self._to_user_model(user_data)
 
+    @traced()
+    async def get_by_ids(self, user_ids: Iterable[int]) -> dict[int, User]:
+        return {
+            user_id: self._to_user_model(user_data)
+            for user_id in set(user_ids)
+            if (user_data := self.database.users.get(user_id))
+        }
+
     def _to_user_model(self, user_data: dict) -> User:
         return User(**user_data)
@@ -0,0 +1,38 @@
+from typing import Iterable
+from app.infra.persistence import statements
+from app.infra.persistence.mysql.database import Database
+from app.domain.repositories import UserRepository
+from app.domain.models.user import User
+from app.infra.tracing import traced
+
+USER_COLUMNS = ("user_id", "email", "created", "updated")
+SELECT_USER_QUERY = statements.select("users", USER_COLUMNS, by=("user_id",))
+
+
+# subclassing UserRepository
+class MySQLUserRepository(UserRepository):
+    def __init__(self, database: Database) -> None:
+        self.database = database
+
+    @traced()
+    async def get_by_id(self, user_id: int) -> User | None:
+        user_data = await self.database.fetch_one(query=SELECT_USER_QUERY, args=(user_id,))
+
+        # deserialize (from dict to domain model) and return
+        return self._to_user_model(user_data) if user_data else None
+
+    @traced()
+    async def get_by_ids(self, user_ids: Iterable[int]) -> dict[int, User]:
+        if not (user_ids := tuple(set(user_ids))):
+            return {}
+
+        size = statements.in_list_size(len(user_ids))
+        users = await self.database.fetch_all(
+            query=statements.select_in("users", USER_COLUMNS, "user_id", size),
+            args=statements.pad(user_ids, size),
+        )
+
+        return {user_data["user_id"]: self._to_user_model(user_data) for user_data in users}
+
+    def _to_user_model(self, user_data: dict) -> User:
+        return User(**user_data)
@@ -0,0 +1,2 @@
+from app.infra.tracing.exporters import SpanExporter, StdoutSpanExporter, FileSpanExporter
+from app.infra.tracing.tracer import Span, Tracer, tracer, traced
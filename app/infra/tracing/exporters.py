@@ -0,0 +1,96 @@
+import queue
+import sys
+import threading
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, TextIO
+import orjson
+
+if TYPE_CHECKING:
+    from app.infra.tracing.tracer import Span
+
+# expose
+__all__ = ("SpanExporter", "StdoutSpanExporter", "FileSpanExporter", )
+
+SCOPE_NAME = "app.infra.tracing"
+
+
+# lines are handed to a writer thread, a slow disk or pipe never blocks the event loop
+# when the writer falls behind by queue_size traces, new ones are dropped
+class SpanExporter(ABC):
+    def __init__(self, queue_size: int = 4096) -> None:
+        self.dropped = 0
+        self._queue: queue.Queue[bytes | None] = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._writer.start()
+
+    # one OTLP/JSON ExportTraceServiceRequest per trace, one line each (jsonl)
+    # https://opentelemetry.io/docs/specs/otlp/#json-protobuf-encoding
+    def export(self, service_name: str, spans: list["Span"]) -> None:
+        if not spans:
+            return
+        payload = {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": service_name}},
+                    ],
+                },
+                "scopeSpans": [{
+                    "scope": {"name": SCOPE_NAME},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }],
+        }
+        try:
+            self._queue.put_nowait(orjson.dumps(payload) + b"\n")
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while (line := self._queue.get()) is not None:
+            lines = [line]
+            # write whatever queued up meanwhile in one go
+            while True:
+                try:
+                    if (line := self._queue.get_nowait()) is None:
+                        self.write(b"".join(lines))
+                        return
+                except queue.Empty:
+                    break
+                lines.append(line)
+            self.write(b"".join(lines))
+
+    # write what is queued and stop the writer thread
+    def close(self) -> None:
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    # called from the writer thread
+    @abstractmethod
+    def write(self, data: bytes) -> None: ...
+
+
+class StdoutSpanExporter(SpanExporter):
+    def __init__(self, stream: TextIO = sys.stdout, queue_size: int = 4096) -> None:
+        self.stream = stream
+        super().__init__(queue_size=queue_size)
+
+    def write(self, data: bytes) -> None:
+        self.stream.buffer.write(data)
+        self.stream.flush()
+
+
+class FileSpanExporter(SpanExporter):
+    def __init__(self, file_path: str, queue_size: int = 4096) -> None:
+        # flushed append, the file can be tailed or shipped by a collector
+        self.file = open(file_path, "ab")
+        super().__init__(queue_size=queue_size)
+
+    def write(self, data: bytes) -> None:
+        self.file.write(data)
+        self.file.flush()
+
+    def close(self) -> None:
+        super().close()
+        self.file.close()
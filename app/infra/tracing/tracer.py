@@ -0,0 +1,215 @@
+import functools
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterator, ParamSpec, TypeVar
+from app.infra.tracing.exporters import SpanExporter
+
+# expose
+__all__ = ("Span", "Tracer", "tracer", "traced", )
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# W3C trace context header
+# https://www.w3.org/TR/trace-context/#traceparent-header
+TRACEPARENT_REGEX = re.compile(
+    r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$"
+)
+SAMPLED_FLAG = 0x01
+
+# OTLP span kinds
+# https://opentelemetry.io/docs/specs/otel/trace/api/#spankind
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+# OTLP status codes
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+
+# a finished span is exported once its trace (root span) is done
+@dataclass(kw_only=True)
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None = None
+    sampled: bool = True
+    kind: int = SPAN_KIND_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+    # shared by all spans of the same trace in this process, exported by the root span
+    finished: list["Span"] = field(default_factory=list, repr=False)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{SAMPLED_FLAG if self.sampled else 0:02x}"
+
+    # https://opentelemetry.io/docs/specs/otlp/#json-protobuf-encoding
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            # 64-bit integers are encoded as strings in OTLP/JSON
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [
+                {"key": key, "value": _to_any_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": (
+                {"code": STATUS_CODE_ERROR, "message": self.error}
+                if self.error is not None
+                else {"code": STATUS_CODE_OK}
+            ),
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _to_any_value(value: Any) -> dict:
+    match value:
+        case bool():
+            return {"boolValue": value}
+        case int():
+            return {"intValue": str(value)}
+        case float():
+            return {"doubleValue": value}
+        case _:
+            return {"stringValue": str(value)}
+
+
+# span of the current task, every asyncio task gets a copy of the context
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(
+        self,
+        exporter: SpanExporter | None = None,
+        sample_ratio: float = 1.0,
+        service_name: str = "post-service",
+        enabled: bool = False,
+    ) -> None:
+        self.configure(
+            exporter=exporter,
+            sample_ratio=sample_ratio,
+            service_name=service_name,
+            enabled=enabled,
+        )
+
+    def configure(
+        self,
+        exporter: SpanExporter | None = None,
+        sample_ratio: float = 1.0,
+        service_name: str = "post-service",
+        enabled: bool = True,
+    ) -> None:
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+        self.service_name = service_name
+        self.enabled = enabled and exporter is not None
+
+    @staticmethod
+    def current_span() -> Span | None:
+        return _current_span.get()
+
+    # root span of a request, continues the caller's trace if a valid traceparent is given
+    @contextmanager
+    def start_trace(self, name: str, traceparent: str | None = None, **attributes: Any) -> Iterator[Span | None]:
+        if not self.enabled:
+            yield None
+            return
+
+        if traceparent and (match := TRACEPARENT_REGEX.match(traceparent.strip().lower())):
+            trace_id, parent_span_id, flags = match.groups()
+            # parent based sampling, respect the caller's decision
+            sampled = bool(int(flags, 16) & SAMPLED_FLAG)
+        else:
+            trace_id, parent_span_id = _random_hex(16), None
+            sampled = random.random() < self.sample_ratio
+
+        root = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=_random_hex(8),
+            parent_span_id=parent_span_id,
+            sampled=sampled,
+            kind=SPAN_KIND_SERVER,
+            attributes=attributes,
+        )
+        try:
+            with self._activate(root):
+                yield root
+        finally:
+            if root.sampled and self.exporter:
+                self.exporter.export(self.service_name, root.finished)
+
+    # child span of the current one, no-op outside of a sampled trace
+    @contextmanager
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Iterator[Span | None]:
+        if not (parent := _current_span.get()) or not parent.sampled:
+            yield None
+            return
+
+        child = Span(
+            name=name,
+            trace_id=parent.trace_id,
+            span_id=_random_hex(8),
+            parent_span_id=parent.span_id,
+            kind=kind,
+            attributes=attributes,
+            finished=parent.finished,
+        )
+        with self._activate(child):
+            yield child
+
+    @contextmanager
+    def _activate(self, span: Span) -> Iterator[None]:
+        token = _current_span.set(span)
+        try:
+            yield
+        except BaseException as exc:
+            span.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if span.sampled:
+                span.finished.append(span)
+
+
+def _random_hex(nbytes: int) -> str:
+    return random.getrandbits(nbytes * 8).to_bytes(nbytes, "big").hex()
+
+
+tracer = Tracer()
+
+
+# decorator to wrap a coroutine function into a span
+# functools.wraps keeps the signature, so it can also decorate fastapi route handlers
+def traced(name: str | None = None, **attributes: Any) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with tracer.span(span_name, **attributes):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
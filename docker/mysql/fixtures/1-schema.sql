@@ -4,9 +4,28 @@ CREATE DATABASE IF NOT EXISTS fastapi;
 
 USE fastapi;
 
-CREATE TABLE IF NOT EXISTS posts (
+CREATE TABLE IF NOT EXISTS users (
     -- Auto-incrementing primary key
-    post_id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+    user_id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+
+    -- User email
+    email VARCHAR(254) NULL,
+
+    -- Timestamps
+    created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,                             -- Set when record is created
+    updated TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, -- Auto-updates when record changes
+
+    -- Indexes
+    PRIMARY KEY (user_id),    -- Primary key for fast lookups and joins from posts
+    UNIQUE KEY (email)        -- One account per email
+)
+ENGINE=InnoDB                 -- Transactional storage engine
+DEFAULT CHARSET=utf8mb4       -- Unicode character set
+AUTO_INCREMENT=1;             -- Start auto-increment from 1
+
+CREATE TABLE IF NOT EXISTS posts (
+    -- Auto-incrementing primary key, 64 bits to hold snowflake ids when sharded
+    post_id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
     
     -- Foreign key to users table
     user_id INT UNSIGNED NOT NULL,
@@ -16,7 +35,7 @@ CREATE TABLE IF NOT EXISTS posts (
     
     -- Timestamps
     created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,                             -- Set when record is created
-    updated TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, -- Auto-updates when record changes
+    updated TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), -- Auto-updates when record changes, microseconds to serve as a version
     
     -- Indexes
     PRIMARY KEY (post_id),    -- Primary key for fast lookups
@@ -0,0 +1,8 @@
+-- Samples
+INSERT IGNORE INTO users (user_id, email)
+VALUES
+(1, "user_1@example.com"),
+(2, "user_2@example.com"),
+(3, "user_3@example.com"),
+(4, "user_4@example.com"),
+(5, "user_5@example.com");
\ No newline at end of file
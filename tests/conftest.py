@@ -0,0 +1,6 @@
+import os
+
+# in-memory backend, no MySQL needed
+# dynaconf reads the environment when the config is first accessed
+os.environ.setdefault("DYNACONF_DATABASES__BACKEND", "memory")
+os.environ.setdefault("DYNACONF_DATABASES__MEM_DB__PATH", "")
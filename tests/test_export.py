@@ -0,0 +1,34 @@
+import io
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+from app.domain.repositories.post import EXPORT_COLUMNS
+from app.entrypoint.fastapi import export
+from app.entrypoint.fastapi.factory import create_app
+
+
+def test_export_formats() -> None:
+    with TestClient(create_app()) as client:
+        response = client.get("/posts/export", params={"format": "arrow", "batch_size": 2})
+        assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert tuple(table.column_names) == EXPORT_COLUMNS
+        assert table.num_rows > 0
+
+        response = client.get("/posts/export", params={"format": "parquet"})
+        assert response.headers["content-type"] == "application/vnd.apache.parquet"
+        assert pq.read_table(io.BytesIO(response.content)).num_rows == table.num_rows
+
+        response = client.get("/posts/export", params={"format": "csv"})
+        assert response.headers["content-type"].startswith("text/csv")
+        assert len(response.text.splitlines()) == table.num_rows + 1
+
+
+def test_export_format_unavailable(monkeypatch) -> None:
+    # without pyarrow, the columnar formats are refused rather than answered as csv
+    monkeypatch.setattr(export, "pa", None)
+    with TestClient(create_app()) as client:
+        response = client.get("/posts/export", params={"format": "arrow"})
+        assert response.status_code == 400
+        assert response.json()["type"] == "invalid_field_value"
+        assert client.get("/posts/export", params={"format": "csv"}).status_code == 200
@@ -0,0 +1,13 @@
+from fastapi.testclient import TestClient
+from app.entrypoint.fastapi.factory import create_app
+
+
+# ?fields= answers with sparse posts, the schema has to say so
+def test_sparse_fieldsets_documented() -> None:
+    with TestClient(create_app()) as client:
+        spec = client.get("/openapi.json").json()
+
+    for path in ("/posts", "/posts/{post_id}"):
+        schema = spec["paths"][path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        assert "#/components/schemas/PostFields" in str(schema)
+    assert not spec["components"]["schemas"]["PostFields"].get("required")
@@ -0,0 +1,30 @@
+from fastapi.testclient import TestClient
+from app.entrypoint.fastapi.factory import create_app
+
+
+def _pages(client: TestClient, url: str) -> list[list[dict]]:
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append(response.json())
+        url = response.links.get("next", {}).get("url")
+    return pages
+
+
+def test_list_posts_pages() -> None:
+    with TestClient(create_app()) as client:
+        everything = client.get("/posts").json()
+        pages = _pages(client, "/posts?limit=2")
+
+    assert [len(page) for page in pages[:-1]] == [2] * (len(pages) - 1)
+    assert [post for page in pages for post in page] == everything
+
+
+def test_list_posts_fields_pages_without_post_id() -> None:
+    with TestClient(create_app()) as client:
+        everything = client.get("/posts", params={"fields": "title"}).json()
+        pages = _pages(client, "/posts?fields=title&limit=2")
+
+    assert all(set(post) == {"title"} for page in pages for post in page)
+    assert [post for page in pages for post in page] == everything
@@ -0,0 +1,16 @@
+from fastapi.testclient import TestClient
+from app.config.config import config
+from app.entrypoint.fastapi.factory import create_app
+
+
+def test_rate_limited_after_burst() -> None:
+    limit = config["rate_limit"]["routes"]["GET /posts"]
+    with TestClient(create_app()) as client:
+        for _ in range(limit["burst"]):
+            response = client.get("/posts")
+            assert response.status_code == 200
+            assert "RateLimit-Remaining" in response.headers
+
+        response = client.get("/posts")
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,26 @@
+from app.infra.persistence.mysql.snowflake import SnowflakeIdGenerator
+from app.infra.repositories import ShardedMySQLPostRepository
+
+
+def _repository(shards: int, legacy_max_id: int) -> ShardedMySQLPostRepository:
+    # routing only, the databases are never connected
+    return ShardedMySQLPostRepository(
+        databases=[object()] * shards,  # type: ignore[list-item]
+        id_generator=SnowflakeIdGenerator(),
+        user_repository=None,  # type: ignore[arg-type]
+        legacy_max_id=legacy_max_id,
+    )
+
+
+def test_snowflake_ids_route_to_their_shard() -> None:
+    repository = _repository(shards=4, legacy_max_id=100_000)
+    generator = SnowflakeIdGenerator()
+    for shard_id in range(4):
+        assert repository._route(generator.next_id(shard_id)) is repository.shards[shard_id]
+
+
+def test_legacy_ids_route_to_the_first_shard() -> None:
+    repository = _repository(shards=4, legacy_max_id=100_000)
+    # 2**14 would decode to shard 1
+    for post_id in (1, 2**14, 3 * 2**14, 100_000):
+        assert repository._route(post_id) is repository.shards[0]
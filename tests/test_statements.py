@@ -0,0 +1,17 @@
+from app.infra.persistence import statements
+from app.infra.repositories.post.MySQLPostRepository import POST_WITH_USER_QUERY, SELECT_POST_WITH_USER_QUERY
+
+
+def test_paginate() -> None:
+    assert statements.paginate(POST_WITH_USER_QUERY, "p.post_id", after=True, limit=True) == (
+        f"{POST_WITH_USER_QUERY} WHERE p.post_id > %s ORDER BY p.post_id LIMIT %s"
+    )
+    assert statements.paginate("SELECT a FROM t", "a", after=False, limit=False) == "SELECT a FROM t ORDER BY a"
+
+
+def test_paginate_query_with_conditions() -> None:
+    query = statements.where(POST_WITH_USER_QUERY, ("u.user_id",))
+    assert statements.paginate(query, "p.post_id", after=True, limit=False) == (
+        f"{POST_WITH_USER_QUERY} WHERE u.user_id = %s AND p.post_id > %s ORDER BY p.post_id"
+    )
+    assert statements.paginate(SELECT_POST_WITH_USER_QUERY, "p.post_id", after=True, limit=False).count("WHERE") == 1
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from pathlib import Path
+from app.infra.persistence.mem_db.storage import StorageEngine, RECORD_HEADER
+
+
+def _log_files(path: Path) -> list[Path]:
+    return sorted(path.glob("wal.*.log"))
+
+
+async def _write_rows(path: Path, count: int, **kwargs) -> None:
+    engine = StorageEngine(str(path), **kwargs)
+    tables = engine.open()
+    engine.start()
+    for post_id in range(1, count + 1):
+        tables["posts"][post_id] = {"post_id": post_id, "title": f"title {post_id}"}
+    tables["posts"][1]["title"] = "changed"
+    del tables["posts"][2]
+    await engine.commit()
+    await engine.close()
+
+
+def test_replay_log(tmp_path: Path) -> None:
+    asyncio.run(_write_rows(tmp_path, 10))
+
+    tables = StorageEngine(str(tmp_path)).open()
+    assert sorted(tables["posts"]) == [1, *range(3, 11)]
+    assert tables["posts"][1]["title"] == "changed"
+
+
+def test_torn_tail_is_cut_off(tmp_path: Path) -> None:
+    asyncio.run(_write_rows(tmp_path, 10))
+    [log_path] = _log_files(tmp_path)
+    size = log_path.stat().st_size
+    # crash in the middle of a write: header of a record whose payload never made it
+    with open(log_path, "ab") as file:
+        file.write(RECORD_HEADER.pack(100, 0) + b"partial")
+
+    tables = StorageEngine(str(tmp_path)).open()
+    assert len(tables["posts"]) == 9
+    assert log_path.stat().st_size == size
+
+
+def test_corrupted_record_is_cut_off(tmp_path: Path) -> None:
+    asyncio.run(_write_rows(tmp_path, 10))
+    [log_path] = _log_files(tmp_path)
+    data = bytearray(log_path.read_bytes())
+    # flip a byte of the last record (the delete of post 2)
+    data[-1] ^= 0xFF
+    log_path.write_bytes(data)
+
+    tables = StorageEngine(str(tmp_path)).open()
+    assert 2 in tables["posts"]
+    assert tables["posts"][1]["title"] == "changed"
+
+
+def test_commit_waits_for_fsync(tmp_path: Path) -> None:
+    async def main() -> None:
+        engine = StorageEngine(str(tmp_path), commit_interval=0.01)
+        tables = engine.open()
+        engine.start()
+        tables["posts"][1] = {"post_id": 1}
+        assert _log_files(tmp_path)[0].stat().st_size == 0
+        await engine.commit()
+        assert _log_files(tmp_path)[0].stat().st_size > 0
+        await engine.close()
+
+    asyncio.run(main())
+
+
+def test_commits_continue_during_compaction(tmp_path: Path, monkeypatch) -> None:
+    snapshot_started, release_snapshot = threading.Event(), threading.Event()
+    write_snapshot = StorageEngine._write_snapshot
+
+    # a snapshot that takes until released
+    def slow_write_snapshot(self, tables, generation):
+        snapshot_started.set()
+        release_snapshot.wait(timeout=10)
+        write_snapshot(self, tables, generation)
+
+    monkeypatch.setattr(StorageEngine, "_write_snapshot", slow_write_snapshot)
+
+    async def main() -> None:
+        engine = StorageEngine(str(tmp_path), commit_interval=0.001, compact_threshold=1)
+        tables = engine.open()
+        engine.start()
+        tables["posts"][1] = {"post_id": 1}
+        await engine.commit()
+        await asyncio.to_thread(snapshot_started.wait, 10)
+
+        # the snapshot is still being written, this group is committed anyway
+        tables["posts"][2] = {"post_id": 2}
+        await asyncio.wait_for(engine.commit(), timeout=1)
+        release_snapshot.set()
+        await engine.close()
+
+    asyncio.run(main())
+    monkeypatch.undo()
+
+    tables = StorageEngine(str(tmp_path)).open()
+    assert sorted(tables["posts"]) == [1, 2]
+    assert (tmp_path / "snapshot.db").exists()